@@ -0,0 +1,60 @@
+# bench_transcribe.py
+#
+# Compare transcription backends on the vocal stems already in karaoke_data.
+#
+#   python bench_transcribe.py --configs whisper:medium faster-whisper:medium faster-whisper:small --limit 3
+
+import argparse
+import time
+from pathlib import Path
+import soundfile as sf
+from processor.transcription_service import TranscriptionService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transcription backends")
+    parser.add_argument("--data", default="karaoke_data", help="cache folder with <song>/vocals.wav")
+    parser.add_argument("--configs", nargs="+", default=["whisper:medium", "faster-whisper:medium", "faster-whisper:small"],
+                        help="backend:model pairs")
+    parser.add_argument("--limit", type=int, default=3, help="number of songs to transcribe")
+    args = parser.parse_args()
+
+    songs = sorted(Path(args.data).glob("*/vocals.wav"))[:args.limit]
+    if not songs:
+        print(f"❌ No vocals.wav found under {args.data}")
+        return
+
+    rows = []
+    for config in args.configs:
+        backend, model_name = config.split(":", 1)
+        service = TranscriptionService()  # fresh instance so load time is measured
+
+        start = time.perf_counter()
+        try:
+            service.get_backend(backend, model_name)
+        except Exception as e:
+            print(f"⚠️ Skipping {config}: {e}")
+            continue
+        load_time = time.perf_counter() - start
+
+        wall = audio = 0.0
+        segments = 0
+        for vocals in songs:
+            duration = sf.info(str(vocals)).duration
+            start = time.perf_counter()
+            segs = service.transcribe(vocals, backend=backend, model_name=model_name,
+                                      fp16=False, temperature=0.0, no_speech_threshold=0.2)
+            wall += time.perf_counter() - start
+            audio += duration
+            segments += len(segs)
+
+        rows.append((config, load_time, wall, audio, wall / audio if audio else 0.0, segments))
+
+    print()
+    print(f"{'backend:model':<26}{'load s':>9}{'wall s':>10}{'audio s':>10}{'RTF':>8}{'segments':>10}")
+    for config, load_time, wall, audio, rtf, segments in rows:
+        print(f"{config:<26}{load_time:>9.1f}{wall:>10.1f}{audio:>10.1f}{rtf:>8.2f}{segments:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,26 @@ import os
 import json
 from pathlib import Path
 import re
+import threading
+import time
+from cache import stem_store
+from utils.youtube_ids import extract_video_id
 
 class CacheManager:
+    # Also keep instrumental/vocals as memory-mappable .stem files. Off by
+    # default: it stores an extra int16 copy of every song's stems.
+    USE_STEM_STORE = os.environ.get("KARAOKE_STEM_STORE", "0") == "1"
+    # One index of every song's meta, so the library never needs a folder scan
+    LIBRARY_FILE = "library.json"
+    # Bumped when the on-disk layout changes; older libraries are migrated once
+    LIBRARY_VERSION = 2
+
     def __init__(self):
         self.BASE_DIR = Path("karaoke_data")
         self.BASE_DIR.mkdir(exist_ok=True)
+        self._library = None        # song id -> {id, title, artist, url, added, lyrics}
+        self._library_dir = None    # BASE_DIR the library was loaded from
+        self._library_lock = threading.RLock()
 
     def _sanitize(self, name: str) -> str:
         """Sanitize song name for safe folder names."""
@@ -15,13 +30,33 @@ class CacheManager:
     def get_base_dir(self) -> Path:
         return self.BASE_DIR
 
-    def get_song_dir(self, title: str, artist: str) -> Path:
-        folder_name = self._sanitize(f"{artist}_{title}")
-        return self.BASE_DIR / folder_name
+    def _legacy_dir(self, title: str, artist: str) -> Path:
+        return self.BASE_DIR / self._sanitize(f"{artist}_{title}")
+
+    def get_song_dir(self, title: str, artist: str, url: str = None) -> Path:
+        """
+        Songs are stored under their YouTube videoId, so the same video queued
+        with different title/artist spellings shares one folder. Without a
+        usable URL (e.g. web-remote library picks) the library is searched by
+        title/artist, then the old artist_title folder name is used.
+        """
+        video_id = extract_video_id(url)
+        if video_id:
+            song_dir = self.BASE_DIR / video_id
+            legacy = self._legacy_dir(title, artist)
+            if not song_dir.exists() and legacy.exists():
+                return legacy  # not migrated yet
+            return song_dir
+
+        with self._library_lock:
+            for song in self._ensure_library().values():
+                if song["title"] == title and song["artist"] == artist:
+                    return self.BASE_DIR / song["id"]
+        return self._legacy_dir(title, artist)
 
-    def check_existing(self, title: str, artist: str):
+    def check_existing(self, title: str, artist: str, url: str = None):
         """Check if this song has already been processed."""
-        song_dir = self.get_song_dir(title, artist)
+        song_dir = self.get_song_dir(title, artist, url)
         if not song_dir.exists():
             return None
 
@@ -51,9 +86,178 @@ class CacheManager:
         return None
 
 
+    def ensure_stem_store(self, song_dir) -> bool:
+        """Write instrumental.stem / vocals.stem next to the WAVs if missing or stale."""
+        if not self.USE_STEM_STORE:
+            return False
+        ok = True
+        for name in ("instrumental.wav", "vocals.wav"):
+            wav = Path(song_dir) / name
+            if not wav.exists() or stem_store.is_fresh(wav):
+                continue
+            try:
+                stem_store.write_stem(wav)
+            except Exception as e:
+                print(f"⚠️ Failed to write stem store for {wav}: {e}")
+                ok = False
+        return ok
+
     def save_meta(self, title: str, artist: str, url: str):
-        song_dir = self.get_song_dir(title, artist)
+        song_dir = self.get_song_dir(title, artist, url)
         song_dir.mkdir(exist_ok=True)
-        meta = {"title": title, "artist": artist, "url": url}
+        meta = {"title": title, "artist": artist, "url": url, "videoId": extract_video_id(url)}
         with open(song_dir / "meta.json", "w", encoding="utf-8") as f:
             json.dump(meta, f, indent=2)
+        self._index_song(song_dir, meta)
+
+    # -------------------------
+    # Library index
+    # -------------------------
+    def _library_file(self) -> Path:
+        return self.BASE_DIR / self.LIBRARY_FILE
+
+    def _ensure_library(self):
+        """Load the index for the current BASE_DIR (built from meta.json files once if missing)."""
+        with self._library_lock:
+            if self._library is not None and self._library_dir == self.BASE_DIR:
+                return self._library
+            self._library_dir = self.BASE_DIR
+            self._library = {}
+            path = self._library_file()
+            if path.exists():
+                try:
+                    data = json.loads(path.read_text(encoding="utf-8"))
+                    if isinstance(data, dict) and data.get("version") == self.LIBRARY_VERSION:
+                        self._library = {s["id"]: s for s in data["songs"]}
+                        self._reconcile()
+                        return self._library
+                except Exception as e:
+                    print(f"⚠️ Failed to read library index, rebuilding: {e}")
+            # Missing or older library: one-time move to videoId folders, then reindex
+            self.migrate_to_video_ids()
+            self.rebuild_library()
+            return self._library
+
+    def migrate_to_video_ids(self) -> int:
+        """Rename artist_title song folders to their videoId. Returns how many moved."""
+        moved = 0
+        for folder in sorted(self.BASE_DIR.iterdir()):
+            meta_file = folder / "meta.json"
+            if not folder.is_dir() or not meta_file.exists():
+                continue
+            try:
+                meta = json.loads(meta_file.read_text(encoding="utf-8"))
+            except Exception:
+                continue
+            video_id = extract_video_id(meta.get("url"))
+            if not video_id or folder.name == video_id:
+                continue
+            target = self.BASE_DIR / video_id
+            if target.exists():
+                print(f"⚠️ Duplicate of {video_id} left in place: {folder.name}")
+                continue
+            try:
+                folder.rename(target)
+                meta["videoId"] = video_id
+                (target / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+                moved += 1
+            except Exception as e:
+                print(f"⚠️ Failed to migrate {folder.name}: {e}")
+        if moved:
+            print(f"✅ Migrated {moved} song folders to videoId keys")
+        return moved
+
+    def rebuild_library(self):
+        """Rescan every song folder's meta.json and rewrite the index."""
+        with self._library_lock:
+            self._library_dir = self.BASE_DIR
+            self._library = {}
+            for folder in sorted(self.BASE_DIR.iterdir()):
+                if folder.is_dir():
+                    self._index_folder(folder)
+            self._save_library()
+
+    def _reconcile(self):
+        """
+        Catch up with song folders deleted or copied in by hand since the index
+        was saved. Only one directory listing, plus a meta.json read for
+        folders the index doesn't know yet.
+        """
+        with os.scandir(self.BASE_DIR) as it:
+            folders = {e.name for e in it if e.is_dir()}
+        changed = False
+        for song_id in [i for i in self._library if i not in folders]:
+            del self._library[song_id]
+            changed = True
+        for name in sorted(folders - self._library.keys()):
+            changed |= self._index_folder(self.BASE_DIR / name)
+        if changed:
+            self._save_library()
+
+    def _index_folder(self, folder: Path) -> bool:
+        """Add a song folder to the in-memory index from its meta.json. False if it has none."""
+        meta_file = folder / "meta.json"
+        try:
+            meta = json.loads(meta_file.read_text(encoding="utf-8"))
+            added = meta_file.stat().st_mtime
+        except Exception:
+            return False
+        self._library[folder.name] = self._library_entry(folder, meta, added)
+        return True
+
+    @staticmethod
+    def _lyrics_words(song_dir: Path) -> str:
+        """Unique lyric words (timestamps stripped) for the search index."""
+        lrc = song_dir / "lyrics.lrc"
+        if not lrc.exists():
+            return ""
+        try:
+            text = re.sub(r"\[[^\]]*\]", " ", lrc.read_text(encoding="utf-8"))
+        except Exception:
+            return ""
+        return " ".join(dict.fromkeys(re.findall(r"\w+", text.casefold())))
+
+    def _library_entry(self, song_dir: Path, meta, added=None):
+        return {
+            "id": song_dir.name,
+            "title": meta.get("title", ""),
+            "artist": meta.get("artist", ""),
+            "url": meta.get("url"),
+            "added": added or time.time(),
+            "lyrics": self._lyrics_words(song_dir),
+        }
+
+    def _index_song(self, song_dir: Path, meta):
+        with self._library_lock:
+            library = self._ensure_library()
+            old = library.get(song_dir.name)
+            library[song_dir.name] = self._library_entry(song_dir, meta, old and old.get("added"))
+            self._save_library()
+
+    def _save_library(self):
+        path = self._library_file()
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            data = {"version": self.LIBRARY_VERSION, "songs": list(self._library.values())}
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"⚠️ Failed to save library index: {e}")
+
+    def list_songs(self) -> list:
+        """All indexed songs, ordered by artist then title."""
+        with self._library_lock:
+            songs = self._ensure_library().values()
+            return sorted(songs, key=lambda s: (s["artist"].casefold(), s["title"].casefold(), s["id"]))
+
+    def get_song(self, song_id: str):
+        """Index entry for a song id (its folder name, normally the videoId), or None."""
+        with self._library_lock:
+            library = self._ensure_library()
+            song = library.get(song_id)
+            if song and not (self.BASE_DIR / song_id).is_dir():
+                # Folder deleted while we were running
+                del library[song_id]
+                self._save_library()
+                return None
+            return song
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class SearchCache:
+    """
+    Persistent YouTube search cache: query -> results and videoId -> metadata,
+    each with a TTL and size-bounded LRU eviction. Stored as one JSON file
+    next to karaoke_data.
+    """
+
+    def __init__(self, path, ttl=24 * 3600, max_queries=500, max_videos=5000):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_queries = max_queries
+        self.max_videos = max_videos
+        self.queries = OrderedDict()  # key -> [timestamp, results]
+        self.videos = OrderedDict()   # videoId -> [timestamp, result]
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def _query_key(query: str, max_results: int) -> str:
+        return f"{max_results}:{' '.join(query.lower().split())}"
+
+    def _get(self, table, key):
+        entry = table.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.ttl:
+            del table[key]
+            return None
+        table.move_to_end(key)
+        return entry[1]
+
+    @staticmethod
+    def _put(table, key, value, limit):
+        table[key] = [time.time(), value]
+        table.move_to_end(key)
+        while len(table) > limit:
+            table.popitem(last=False)
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def get(self, query: str, max_results: int):
+        with self._lock:
+            results = self._get(self.queries, self._query_key(query, max_results))
+            if results is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return results
+
+    def put(self, query: str, max_results: int, results: list):
+        if not results:
+            return
+        with self._lock:
+            self._put(self.queries, self._query_key(query, max_results), results, self.max_queries)
+            for r in results:
+                if r.get("videoId"):
+                    self._put(self.videos, r["videoId"], r, self.max_videos)
+        self.save()
+
+    # -------------------------
+    # Per-video metadata
+    # -------------------------
+    def get_video(self, video_id: str):
+        with self._lock:
+            return self._get(self.videos, video_id)
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+    def load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            now = time.time()
+            for name in ("queries", "videos"):
+                table = getattr(self, name)
+                for key, entry in data.get(name, []):
+                    if now - entry[0] <= self.ttl:
+                        table[key] = entry
+        except Exception as e:
+            print(f"⚠️ Failed to load search cache: {e}")
+
+    def save(self):
+        with self._lock:
+            data = {"queries": list(self.queries.items()), "videos": list(self.videos.items())}
+        try:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"⚠️ Failed to save search cache: {e}")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else None,
+            "queries": len(self.queries),
+            "videos": len(self.videos),
+        }
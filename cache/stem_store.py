@@ -0,0 +1,89 @@
+"""
+Raw stem storage that the player can numpy.memmap directly.
+
+Layout: a 32-byte little-endian header followed by interleaved PCM frames.
+
+    magic    4s   b"KSTM"
+    version  u16
+    dtype    u16  0 = int16, 1 = float32
+    channels u16
+    reserved u16
+    rate     u32
+    frames   u64
+    (padding to HEADER_SIZE)
+"""
+import os
+import struct
+import tempfile
+from pathlib import Path
+import numpy as np
+import soundfile as sf
+
+MAGIC = b"KSTM"
+VERSION = 1
+HEADER_SIZE = 32
+STEM_SUFFIX = ".stem"
+
+_HEADER = struct.Struct("<4sHHHHIQ")
+_DTYPES = {0: np.dtype("<i2"), 1: np.dtype("<f4")}
+_DTYPE_CODES = {"int16": 0, "float32": 1}
+
+
+def stem_path_for(wav_path) -> Path:
+    """instrumental.wav -> instrumental.stem (same folder)."""
+    return Path(wav_path).with_suffix(STEM_SUFFIX)
+
+
+def write_stem(src, dst=None, dtype: str = "int16") -> Path:
+    """Convert an audio file to the raw stem format, block by block."""
+    dst = Path(dst) if dst else stem_path_for(src)
+    code = _DTYPE_CODES[dtype]
+
+    # Unique temp file per writer: two jobs for the same song may convert at once
+    with tempfile.NamedTemporaryFile(dir=dst.parent, prefix=dst.name + ".", suffix=".tmp", delete=False) as out:
+        tmp = out.name
+    try:
+        with sf.SoundFile(str(src)) as f, open(tmp, "wb") as out:
+            header = _HEADER.pack(MAGIC, VERSION, code, f.channels, 0, f.samplerate, f.frames)
+            out.write(header.ljust(HEADER_SIZE, b"\0"))
+            for block in f.blocks(blocksize=65536, dtype=dtype, always_2d=True):
+                out.write(block.astype(_DTYPES[code], copy=False).tobytes())
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return dst
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        raw = f.read(_HEADER.size)
+    magic, version, code, channels, _, rate, frames = _HEADER.unpack(raw)
+    if magic != MAGIC or version != VERSION or code not in _DTYPES:
+        raise ValueError(f"Not a stem file: {path}")
+    return {"dtype": _DTYPES[code], "channels": channels, "samplerate": rate, "frames": frames}
+
+
+def open_stem_memmap(path):
+    """Return (read-only (frames, channels) memmap, header dict)."""
+    header = read_header(path)
+    data = np.memmap(
+        path,
+        dtype=header["dtype"],
+        mode="r",
+        offset=HEADER_SIZE,
+        shape=(header["frames"], header["channels"]),
+    )
+    return data, header
+
+
+def is_fresh(wav_path) -> bool:
+    """True if the .stem next to `wav_path` exists and is not older than it."""
+    stem = stem_path_for(wav_path)
+    try:
+        return stem.stat().st_mtime >= Path(wav_path).stat().st_mtime
+    except FileNotFoundError:
+        return False
@@ -5,22 +5,18 @@ import yt_dlp
 from utils.filename_safety import safe_name_long   # you already have this
 
 class YouTubeDownloader:
-    def download_audio(self, song_dir, url: str) -> str:
+    def download_audio(self, song_dir, url: str, info: dict = None) -> str:
         """
         Downloads the best audio from YouTube with a fully sanitized filename.
+
+        One YoutubeDL instance does a single extraction that serves both the
+        title lookup and the download. Pass `info` (a full extract_info
+        result, e.g. from the searcher) to skip extraction entirely.
         """
         print(f"🔍 Downloading audio from: {url}")
 
-        try:
-            with yt_dlp.YoutubeDL({"quiet": True, "skip_download": True}) as ydl:
-                info = ydl.extract_info(url, download=False)
-                raw_title = info.get("title", "audio")
-        except Exception:
-            raw_title = "audio"
-
-        safe_title = safe_name_long(raw_title)
-
-        outtmpl = os.path.join(song_dir, f"{safe_title}.%(ext)s")
+        # The sanitized title is stored on the info dict and used by the template
+        outtmpl = os.path.join(song_dir, "%(karaoke_title)s.%(ext)s")
 
         ydl_opts = {
             'format': 'bestaudio/best',
@@ -39,7 +35,14 @@ class YouTubeDownloader:
 
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+                if not info or not info.get("formats"):
+                    info = ydl.extract_info(url, download=False)
+                if not info:
+                    raise RuntimeError("No video info extracted")
+
+                info = dict(info)
+                info["karaoke_title"] = safe_name_long(info.get("title") or "audio")
+                info = ydl.process_ie_result(info, download=True)
                 filename = ydl.prepare_filename(info)
                 print(f"✅ Downloaded (safe): {filename}")
                 return filename
@@ -37,7 +37,7 @@ def main():
     title, artist = selected["title"], selected["artist"]
 
     # Check cache first
-    cached = cache.check_existing(title, artist)
+    cached = cache.check_existing(title, artist, selected["url"])
     if cached:
         print(f"✅ Found cached files for '{title}'! Skipping download and processing.")
         instrumental_path = cached["instrumental"]
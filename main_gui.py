@@ -9,19 +9,36 @@ from PySide6.QtCore import Qt, Signal, QThread, QTimer
 from PySide6.QtGui import QFont
 
 from searcher.youtube_search import YouTubeSearcher
+from searcher.search_worker import SearchWorker
+from searcher.library_index import LibraryIndex
 from downloader.yt_downloader import YouTubeDownloader
 from processor.vocal_remover import VocalRemover
 from processor.lyrics_manager import LyricsManager
 from processor.karaoke_player import KaraokePlayer
+from processor.audio_mixer import AudioMixer
 from utils.debug_log import write_debug
-from processor.worker import ProcessWorker
+from processor.prepare_scheduler import PrepareScheduler, song_key
 from cache.cache_manager import CacheManager
+from cache.search_cache import SearchCache
 
 from remote.server import RemoteServer
+from remote.server_process import RemoteServerProcess
 
 import json
 
 import re
+import bisect
+
+# "thread": web remote runs inside this process; "process": in its own
+# process talking to the GUI over queues (keeps the GUI/audio responsive)
+REMOTE_MODE = os.environ.get("KARAOKE_REMOTE_MODE", "thread")
+
+# Seconds to crossfade into the next song when it is already prepared (0 = off)
+try:
+    CROSSFADE_SECONDS = max(0.0, float(os.environ.get("KARAOKE_CROSSFADE_SECONDS", "0")))
+except ValueError:
+    print("⚠️ KARAOKE_CROSSFADE_SECONDS must be a number of seconds; crossfade is off")
+    CROSSFADE_SECONDS = 0.0
 
 def sanitize_filename(name: str) -> str:
     """
@@ -108,6 +125,7 @@ class QueueItemWidget(QWidget):
 class KaraokeAppQt(QWidget):
     queue_changed = Signal(list)
     add_song_signal = Signal(str, str, str, str)  # url, user, title, artist
+    library_indexed = Signal()  # background library index build finished
 
     def __init__(self):
         super().__init__()
@@ -121,26 +139,44 @@ class KaraokeAppQt(QWidget):
         global SAVE_FILE
         SAVE_FILE = self.program_data_folder / "Karaoke_state.json"
 
-        self.searcher = YouTubeSearcher()
+        self.searcher = YouTubeSearcher(cache=SearchCache(self.program_data_folder / "search_cache.json"))
         self.downloader = YouTubeDownloader()
         self.cache = CacheManager()
         self.worker = None
+        self.search_worker = None
+        self._old_searches = set()  # cancelled workers kept alive until their thread exits
+        self.results = []
+        self._result_order = []     # original search index of each results_list row
         self.player_window = None
 
         # Queue variables
         self.queue = []
         self.queue_changed.connect(self.update_next_song_label)
         self.queue_changed.connect(lambda _: self.save_state())  # Auto-save on any queue change
-        self.next_worker = None
-        self.prepared_next = None
         self.current_song = None
         self.song_counts = {}  # "artist - title": count
+        self.cached_songs = []
+        self.library_index = LibraryIndex()  # title/artist/lyrics search over cached_songs
+        self.library_indexed.connect(self.filter_cache_list)
 
         self._setup_ui()
+
+        # Prepares the first few queued songs in parallel (download/Demucs/Whisper)
+        self.scheduler = PrepareScheduler(self.cache)
+        self.scheduler.prepared.connect(self._on_next_prepared)
+        self.scheduler.status.connect(lambda s: self.status_label.setText(f"[Next] {s}"))
+        self.scheduler.error.connect(lambda e: QMessageBox.warning(self, "Queue Error", e))
+        self.queue_changed.connect(lambda _: self._prepare_next_song())
+
         self.choose_program_folder()
         self.refresh_cache_list()
 
-        self.remote_server = RemoteServer(self)
+        # One output stream for songs and remote mics (see RemoteServer)
+        self.audio_mixer = AudioMixer()
+        if REMOTE_MODE == "process":
+            self.remote_server = RemoteServerProcess(self)
+        else:
+            self.remote_server = RemoteServer(self)
         self.remote_server.start()
 
         self.add_song_signal.connect(self.queue_song_from_url)
@@ -232,6 +268,8 @@ class KaraokeAppQt(QWidget):
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("🔍 Search for song or artist...")
         self.search_input.textChanged.connect(self.filter_cache_list)
+        self.search_input.textChanged.connect(lambda _: self._cancel_search())
+        self.search_input.returnPressed.connect(self.on_search)
         self.search_btn = QPushButton("Search")
         self.search_btn.clicked.connect(self.on_search)
         search_layout.addWidget(self.search_input)
@@ -392,6 +430,7 @@ class KaraokeAppQt(QWidget):
             # Load queue
             self.queue = data.get("queue", [])
             self._rebuild_rotated_queue()
+            self._prepare_next_song()
             # Load finished
             self.finished_list.clear()
             for song_text in data.get("finished", []):
@@ -405,6 +444,7 @@ class KaraokeAppQt(QWidget):
         folder = QFileDialog.getExistingDirectory(self, "Select Program Folder", str(self.program_data_folder))
         if folder:
             self.program_data_folder = Path(folder)
+            self.searcher.cache = SearchCache(self.program_data_folder / "search_cache.json")
             self.cache_folder = self.program_data_folder / "karaoke_data"
             self.cache_folder.mkdir(exist_ok=True, parents=True)
             self.cache.BASE_DIR = self.cache_folder
@@ -423,28 +463,27 @@ class KaraokeAppQt(QWidget):
     # UI Logic
     # -------------------------
     def refresh_cache_list(self):
-        self.cached_songs = []  # store dicts with title/artist
-        for folder in sorted(self.cache.BASE_DIR.iterdir()):
-            if not folder.is_dir():
-                continue
-            meta = folder / "meta.json"
-            if meta.exists():
-                try:
-                    info = json.loads(meta.read_text(encoding="utf-8"))
-                    self.cached_songs.append(info)
-                except Exception:
-                    continue
+        # Library index entries: {id, title, artist, url, added, lyrics}
+        self.cached_songs = self.cache.list_songs()
+        # Indexed off the GUI thread (only new/changed songs); filtering uses a
+        # substring scan until it's done, then re-runs via library_indexed
+        self.library_index.sync_async(self.cached_songs, on_done=self.library_indexed.emit)
+        if getattr(self, "remote_server", None):
+            self.remote_server.library_changed()
         self.filter_cache_list()  # show filtered list
 
     def filter_cache_list(self):
-        query = self.search_input.text().lower()
+        query = self.search_input.text().strip()
         self.cache_list.clear()
-        for info in self.cached_songs:
-            title = info.get("title", "").lower()
-            artist = info.get("artist", "").lower()
-            if query and query not in title and query not in artist:
-                continue
-            self.cache_list.addItem(f"{info['artist']} - {info['title']}")
+        if query:
+            index = self.library_index
+            songs = [index.songs[i] for i in index.search(query) if i in index.songs]
+        else:
+            songs = self.cached_songs
+        for info in songs:
+            item = QListWidgetItem(f"{info['artist']} - {info['title']}")
+            item.setData(Qt.UserRole, info["id"])
+            self.cache_list.addItem(item)
 
     def on_search(self):
         q = self.search_input.text().strip()
@@ -452,18 +491,59 @@ class KaraokeAppQt(QWidget):
             QMessageBox.warning(self, "Warning", "Enter a search term first.")
             return
 
+        self._cancel_search()
         self.results_list.clear()
+        self.results = []
+        self._result_order = []
         self.status_label.setText("Searching...")
-        QApplication.processEvents()
 
-        try:
-            self.results = self.searcher.search(q, max_results=10)
-            for r in self.results:
-                self.results_list.addItem(f"{r.get('artist', '')} - {r.get('title', '')} ({r.get('duration', '')})")
-            self.status_label.setText(f"Found {len(self.results)} results.")
-        except Exception as e:
-            QMessageBox.critical(self, "Search Error", str(e))
-            self.status_label.setText("Search failed")
+        # Runs off the GUI thread; results stream in through _on_search_result
+        worker = SearchWorker(self.searcher, q, max_results=10)
+        worker.result.connect(self._on_search_result)
+        worker.done.connect(self._on_search_done)
+        worker.error.connect(self._on_search_error)
+        worker.finished.connect(lambda w=worker: self._on_search_thread_exit(w))
+        self.search_worker = worker
+        worker.start()
+
+    def _cancel_search(self):
+        """Drop the running search; its late results are ignored."""
+        worker = self.search_worker
+        if worker is None:
+            return
+        worker.cancel()
+        self._old_searches.add(worker)
+        self.search_worker = None
+        self.status_label.setText("Search cancelled")
+
+    def _on_search_thread_exit(self, worker):
+        self._old_searches.discard(worker)
+        if worker is self.search_worker:
+            self.search_worker = None
+        worker.deleteLater()
+
+    def _on_search_result(self, index, r):
+        if self.sender() is not self.search_worker:
+            return
+        # Keep rows in YouTube's ranking even though they arrive out of order
+        row = bisect.bisect(self._result_order, index)
+        self._result_order.insert(row, index)
+        self.results.insert(row, r)
+        self.results_list.insertItem(row, f"{r.get('artist', '')} - {r.get('title', '')} ({r.get('duration', '')})")
+        self.status_label.setText(f"Searching... {len(self.results)} results")
+
+    def _on_search_done(self, results):
+        if self.sender() is not self.search_worker:
+            return
+        stats = self.searcher.cache.stats() if self.searcher.cache else None
+        hits = f" (cache {stats['hits']} hits / {stats['misses']} misses)" if stats else ""
+        self.status_label.setText(f"Found {len(self.results)} results.{hits}")
+
+    def _on_search_error(self, msg):
+        if self.sender() is not self.search_worker:
+            return
+        QMessageBox.critical(self, "Search Error", msg)
+        self.status_label.setText("Search failed")
 
     def on_result_selected(self):
         if not self.results_list.selectedIndexes():
@@ -477,21 +557,29 @@ class KaraokeAppQt(QWidget):
         if not idxs:
             self.current_selected = None
             return
-        idx = idxs[0].row()
-        folder = sorted(self.cache.BASE_DIR.iterdir())[idx]
-        try:
-            meta = json.loads((folder / "meta.json").read_text(encoding="utf-8"))
-            cached = self.cache.check_existing(meta["title"], meta["artist"])
-            if cached:
-                cached["url"] = meta.get("url")
-                self.current_selected = {
-                    "title": meta["title"],
-                    "artist": meta["artist"],
-                    "url": meta.get("url"),
-                    "cached": cached,
-                }
-        except Exception as e:
-            QMessageBox.warning(self, "Error", str(e))
+        item = self.cache_list.item(idxs[0].row())
+        selected = self._cached_selection(item)
+        if selected:
+            self.current_selected = selected
+
+    def _cached_selection(self, item):
+        """Build a queueable song from a cache_list item via the library index."""
+        meta = self.cache.get_song(item.data(Qt.UserRole))
+        if not meta:
+            # Folder is gone; drop it from the list too (after this click is handled)
+            self.status_label.setText("Song is no longer in the library")
+            QTimer.singleShot(0, self.refresh_cache_list)
+            return None
+        cached = self.cache.check_existing(meta["title"], meta["artist"], meta.get("url"))
+        if not cached:
+            return None
+        cached["url"] = meta.get("url")
+        return {
+            "title": meta["title"],
+            "artist": meta["artist"],
+            "url": meta.get("url"),
+            "cached": cached,
+        }
 
     # -------------------------
     # Queue logic
@@ -529,12 +617,7 @@ class KaraokeAppQt(QWidget):
         self._increment_song_count(song)
         self._rebuild_rotated_queue()
         self.status_label.setText(f"Queued: {song.get('title', '')}")
-        self.queue_changed.emit(self.queue)
-
-        # If first song in the rotated queue, prepare immediately
-        if not self.next_worker and len(self.queue) == 1:
-            self._prepare_next_song()
-
+        self.queue_changed.emit(self.queue)  # also schedules preparation
 
     def update_next_song_label(self):
         """Update the player window's next song label to the first song in queue."""
@@ -558,25 +641,11 @@ class KaraokeAppQt(QWidget):
 
     def on_cache_double_click(self, item):
         """When user double-clicks a cached song, queue it."""
-        idx = self.cache_list.row(item)
-        folder = sorted(self.cache.BASE_DIR.iterdir())[idx]
-        meta_path = folder / "meta.json"
-        if meta_path.exists():
-            try:
-                meta = json.loads(meta_path.read_text(encoding="utf-8"))
-                cached = self.cache.check_existing(meta["title"], meta["artist"])
-                if cached:
-                    cached["url"] = meta.get("url")
-                    self.current_selected = {
-                        "title": meta["title"],
-                        "artist": meta["artist"],
-                        "url": meta.get("url"),
-                        "cached": cached,
-                        "queued_by": 'System'
-                    }
-                    self.queue_song()
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"Failed to load cache: {e}")
+        selected = self._cached_selection(item)
+        if selected:
+            selected["queued_by"] = 'System'
+            self.current_selected = selected
+            self.queue_song()
 
     def _rebuild_rotated_queue(self):
         """Rebuild the queue in user rotation order and update UI."""
@@ -652,12 +721,9 @@ class KaraokeAppQt(QWidget):
             # Rebuild UI (DO NOT apply user-rotation logic here)
             self._rebuild_queue_ui_only()
 
-            # Save & notify
+            # Save & notify (re-prioritises preparation)
             self.queue_changed.emit(self.queue)
 
-            # Prepare next song immediately (optional)
-            self._prepare_next_song()
-
 
     def remove_queue_item(self, index):
         """Remove a queue item and recalc rotation."""
@@ -683,35 +749,13 @@ class KaraokeAppQt(QWidget):
             self.save_state()  # Auto-save after finishing a song
 
     def _prepare_next_song(self):
-        if not self.queue:
-            self.next_worker = None
-            self.prepared_next = None
-            return
-
-        next_song = self.queue[0]
-        self.status_label.setText(f"Preparing next song: {next_song['title']}")
-
-        worker = ProcessWorker(next_song, self.cache, self.program_data_folder)
-        worker.status.connect(lambda s: self.status_label.setText(f"[Next] {s}"))
-        worker.error.connect(lambda e: QMessageBox.warning(self, "Queue Error", e))
-
-        def on_finished(result):
-            self._on_next_prepared(result)
-            # safely delete worker after done
-            worker.quit()
-            worker.wait()
-            worker.deleteLater()
-            if self.next_worker is worker:
-                self.next_worker = None
-
-        worker.finished.connect(on_finished)
-        self.next_worker = worker  # keep reference until done
-        worker.start()
-
+        """Let the scheduler prepare / re-prioritise / cancel to match the queue."""
+        if hasattr(self, "scheduler"):
+            self.scheduler.sync(self.queue)
 
     def _on_next_prepared(self, result):
         """Store preprocessed result for queued song and auto-play if player is open."""
-        # If 'segments' missing (cached song), generate from LRC
+        # Worker parses lyrics already; fall back to parsing the LRC here
         if "segments" not in result or not result["segments"]:
             lrc_path = result.get("lyrics")
             segments = []
@@ -724,28 +768,28 @@ class KaraokeAppQt(QWidget):
                             segments.append({"start": m*60 + s, "end": m*60 + s + 5, "text": text})
             result["segments"] = segments
 
-        self.prepared_next = result
         # Debug: show prepared result video info
         try:
             write_debug(f"Prepared next: url={result.get('url')} video={result.get('video')}")
         except Exception:
             pass
         self.update_next_song_label()
-        self.status_label.setText(f"Next song ready: {result.get('url', '')}")
+        self.status_label.setText(f"Song ready: {result.get('url', '')}")
         self.refresh_cache_list()
-        self.next_worker = None
 
-        if self.player_window and self.player_window.isVisible():
+        # Only the head of the queue can start playing
+        is_next = bool(self.queue) and song_key(self.queue[0]) == result.get("key")
+        if is_next and self.player_window and self.player_window.isVisible():
             self._play_next_from_queue()
 
-    def _play_next_from_queue(self):
+    def _play_next_from_queue(self, crossfade=0.0):
         if not self.queue:
             return
 
         if not self.player_window:
             return
 
-        if self.player_window.playing:  # <-- check if a song is currently playing
+        if self.player_window.playing and not crossfade:  # <-- check if a song is currently playing
             return  # just wait, next song will auto-play when current finishes
 
         next_song = self.queue[0]
@@ -757,10 +801,10 @@ class KaraokeAppQt(QWidget):
         # self.mark_song_finished(next_song)
 
         # If preprocessed song is ready
-        if self.prepared_next and self.prepared_next["url"] == next_song.get("url"):
-            result = self.prepared_next
+        result = self.scheduler.take(next_song)
+        if result:
             try:
-                write_debug(f"Using prepared_next for url={result.get('url')} video={result.get('video')}")
+                write_debug(f"Using prepared result for url={result.get('url')} video={result.get('video')}")
             except Exception:
                 pass
             self.queue.pop(0)
@@ -772,13 +816,13 @@ class KaraokeAppQt(QWidget):
                 write_debug(f"Passing video_path to player: {video_path}")
             except Exception:
                 pass
-            self.player_window.load_song(result["instrumental"], result["segments"], result.get("vocals"), result.get("url"), video_path=video_path)
-            self.prepared_next = None
-            self._prepare_next_song()
+            self.player_window.load_song(result["instrumental"], result["segments"], result.get("vocals"), result.get("url"),
+                                         video_path=video_path, prepared_audio=result.get("audio"),
+                                         crossfade=crossfade)
+            # player owns the stems now
         else:
             # Song is not ready yet, start preprocessing if not already
-            if not self.next_worker:
-                self._prepare_next_song()
+            self._prepare_next_song()
 
     def skip_song(self):
         if self.player_window and self.player_window.isVisible():
@@ -790,25 +834,28 @@ class KaraokeAppQt(QWidget):
     # -------------------------
     def open_player_window(self):
         if not self.player_window or not self.player_window.isVisible():
-            self.player_window = KaraokePlayer(None, [], vocal_path=None)
+            self.player_window = KaraokePlayer(None, [], vocal_path=None, audio_mixer=self.audio_mixer)
+            self.player_window.crossfade_seconds = CROSSFADE_SECONDS
             self.player_window.show()
-            # Connect finished signal to trigger queue monitor again
-            self.player_window.finished.connect(self.start_queue_monitor)
-            # Start monitoring the queue
-            self.start_queue_monitor()
+            # Song end / crossfade window drive the queue directly (no polling)
+            self.player_window.finished.connect(self._on_player_finished)
+            self.player_window.ending_soon.connect(self._on_player_ending_soon)
+            self._play_next_from_queue()
 
-    def start_queue_monitor(self):
+    def _on_player_finished(self):
         self.mark_song_finished()
-        if hasattr(self, 'queue_timer') and self.queue_timer.isActive():
-            self.queue_timer.stop()
-        self.queue_timer = QTimer()
-        self.queue_timer.timeout.connect(self.check_queue_and_play)
-        self.queue_timer.start(500)  # check every 0.5 seconds
-
-    def check_queue_and_play(self):
-        if len(self.queue) > 0:
-            self.queue_timer.stop()  # stop checking while playing
-            self._play_next_from_queue()
+        # Plays now if the next song is prepared, otherwise _on_next_prepared will
+        self._play_next_from_queue()
+
+    def _on_player_ending_soon(self):
+        """Crossfade into the next song if it's already prepared."""
+        if CROSSFADE_SECONDS <= 0 or not self.queue:
+            return
+        prepared = self.scheduler.peek(self.queue[0])
+        if not prepared or not prepared.get("audio"):
+            return
+        self.mark_song_finished()
+        self._play_next_from_queue(crossfade=CROSSFADE_SECONDS)
 
     def pause_song(self):
         if self.player_window and self.player_window.isVisible():
@@ -823,12 +870,11 @@ class KaraokeAppQt(QWidget):
         self.toggle_vocal_btn.setText("Disable Vocal" if self.player_window.vocal_enabled else "Enable Vocal")
 
     def stop_song(self):
-        try:
-            import pygame
-            pygame.mixer.stop()
-        except Exception:
-            pass
         if self.player_window:
+            try:
+                self.player_window.audio_mixer.stop()
+            except Exception:
+                pass
             self.player_window.close()
         self.status_label.setText("Stopped")
 
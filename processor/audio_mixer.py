@@ -1,112 +1,499 @@
 # audio_mixer.py
 import os
 import threading
+import time as _time
 import numpy as np
 from pydub import AudioSegment
-import pygame
 import sounddevice as sd
+import soundfile as sf
+from cache import stem_store
+
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+_INT16_SCALE = np.float32(1.0 / 32768.0)
+
+
+class ArrayStem:
+    """Stem fully decoded into memory as (frames, 2) int16."""
+
+    def __init__(self, data):
+        self.data = data
+        self.frames = len(data)
+        self._buf = np.zeros((0, CHANNELS), dtype=np.float32)
+
+    @classmethod
+    def decode(cls, path: str):
+        audio = (
+            AudioSegment.from_file(path)
+            .set_channels(CHANNELS)
+            .set_frame_rate(SAMPLE_RATE)
+            .set_sample_width(2)
+        )
+        return cls(np.frombuffer(audio.raw_data, dtype=np.int16).reshape(-1, CHANNELS))
+
+    def read(self, start: int, frames: int):
+        """Return up to `frames` float32 frames starting at `start`."""
+        block = self.data[start:start + frames]
+        if len(self._buf) < len(block):
+            self._buf = np.zeros((len(block), CHANNELS), dtype=np.float32)
+        out = self._buf[:len(block)]
+        np.multiply(block, _INT16_SCALE, out=out)
+        return out
+
+    def close(self):
+        pass
+
+
+class StreamingStem:
+    """Stem read block by block from disk; only one block is ever resident."""
+
+    def __init__(self, path: str):
+        self._file = sf.SoundFile(path)
+        if self._file.samplerate != SAMPLE_RATE or self._file.channels not in (1, CHANNELS):
+            self._file.close()
+            raise ValueError(f"Cannot stream {path}: {self._file.samplerate} Hz, {self._file.channels} ch")
+        self.frames = self._file.frames
+        self._pos = 0
+        self._buf = np.zeros((0, self._file.channels), dtype=np.float32)
+
+    def read(self, start: int, frames: int):
+        """Return up to `frames` float32 frames starting at `start`."""
+        frames = max(0, min(frames, self.frames - start))
+        if start != self._pos:
+            self._file.seek(start)
+        if len(self._buf) < frames:
+            self._buf = np.zeros((frames, self._file.channels), dtype=np.float32)
+        block = self._file.read(frames, dtype="float32", always_2d=True, out=self._buf[:frames])
+        self._pos = start + len(block)
+        if block.shape[1] == 1:
+            block = np.repeat(block, CHANNELS, axis=1)
+        return block
+
+    def close(self):
+        self._file.close()
+
+
+class MemmapStem:
+    """Stem backed by a memory-mapped .stem file; no decoding at all."""
+
+    def __init__(self, path: str):
+        self.data, header = stem_store.open_stem_memmap(path)
+        if header["samplerate"] != SAMPLE_RATE or header["channels"] not in (1, CHANNELS):
+            raise ValueError(f"Cannot map {path}: {header['samplerate']} Hz, {header['channels']} ch")
+        self.frames = header["frames"]
+        self._scale = _INT16_SCALE if header["dtype"].kind == "i" else np.float32(1.0)
+        self._buf = np.zeros((0, CHANNELS), dtype=np.float32)
+
+    def read(self, start: int, frames: int):
+        """Return up to `frames` float32 frames starting at `start`."""
+        block = self.data[start:start + frames]
+        if len(self._buf) < len(block):
+            self._buf = np.zeros((len(block), CHANNELS), dtype=np.float32)
+        out = self._buf[:len(block)]
+        # Broadcasting also upmixes a mono (n, 1) block to stereo
+        np.multiply(block, self._scale, out=out)
+        return out
+
+    def close(self):
+        self.data = None
+
+
+def open_stem(path: str, streaming: bool = True):
+    """Open a stem for playback.
+
+    Prefers a fresh memory-mapped .stem next to the file, then streaming from
+    disk when the file allows it, then a full in-memory decode.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    if stem_store.is_fresh(path):
+        try:
+            return MemmapStem(str(stem_store.stem_path_for(path)))
+        except Exception as e:
+            print(f"⚠️ Stem store unusable for {path}: {e}")
+    if streaming:
+        try:
+            return StreamingStem(path)
+        except Exception as e:
+            print(f"⚠️ Streaming unavailable for {path}, decoding into memory: {e}")
+    return ArrayStem.decode(path)
+
+
+class PreparedAudio:
+    """Both stems of one song opened (and warmed) ahead of playback.
+
+    Built off the GUI thread while the previous song plays and handed to
+    AudioMixer.load_prepared(). Memory-mapped and streamed stems cost only
+    the prefetched pages; a full decode only happens for files that can't be
+    mapped or streamed.
+    """
+    PREFETCH_SECONDS = 10
+    _PREFETCH_BLOCK = 4096
+
+    def __init__(self, instrumental_path, vocals_path=None, streaming=True):
+        self.instrumental_path = instrumental_path
+        self.vocals_path = vocals_path
+        self.instrumental = open_stem(instrumental_path, streaming)
+        self.vocals = open_stem(vocals_path, streaming)
+        self._prefetch()
+
+    def _prefetch(self):
+        """Touch the opening seconds so the first callbacks never hit cold disk."""
+        total = SAMPLE_RATE * self.PREFETCH_SECONDS
+        for stem in (self.instrumental, self.vocals):
+            if stem is None:
+                continue
+            for start in range(0, min(total, stem.frames), self._PREFETCH_BLOCK):
+                stem.read(start, self._PREFETCH_BLOCK)
+
+    def matches(self, instrumental_path, vocals_path):
+        return (str(instrumental_path), str(vocals_path)) == (str(self.instrumental_path), str(self.vocals_path))
+
+    def close(self):
+        for stem in (self.instrumental, self.vocals):
+            if stem is not None:
+                stem.close()
+        self.instrumental = self.vocals = None
 
 
 class AudioMixer:
-    def __init__(self):
-        """Initialize pygame mixer and internal state."""
-        pygame.mixer.init(frequency=44100, size=-16, channels=2)
-        pygame.mixer.set_num_channels(4)  # 0=instrumental, 1=vocals, 2=mic
-        self.instrumental = None
+    SAMPLE_RATE = SAMPLE_RATE
+    CHANNELS = CHANNELS
+
+    def __init__(self, streaming: bool = True):
+        """Open the output stream and initialize internal state.
+
+        Instrumental and vocals are mixed in a single output callback from a
+        shared read cursor, so seeking only moves the cursor. With
+        `streaming` the stems are read from disk block by block; otherwise
+        (or when a file can't be streamed) they are decoded into memory once.
+        """
+        self.streaming = streaming
+        self.instrumental = None   # ArrayStem / StreamingStem
         self.vocals = None
         self.vocal_enabled = True
+        self.vocal_volume = 1.0
+        self.instrumental_gain = 1.0
+
+        # Live inputs (e.g. remote mics) mixed on top of the song, even while
+        # paused: name -> (source, gain). Sources expose mix_into(mono_out) and
+        # return how many signals they added. Replaced, never mutated, so the
+        # callback can read it without the lock.
+        self._inputs = {}
+        self._input_buf = np.zeros(0, dtype=np.float32)
 
         self.paused = False    # ← NEW
+        self._playing = False
+        self._cursor = 0       # next frame to render
+        # Playback clock: (first frame of last rendered block, DAC time of
+        # that frame or None, frames in the block). Replaced as one tuple so
+        # readers never see a half-updated clock.
+        self._clock = (0, None, 0)
+        self._lock = threading.Lock()
+
+        # Transitions: the outgoing song keeps playing from `_fade` while the
+        # new one ramps in over `_fade_in` = (frames done, total frames).
+        self._fade = None
+        self._fade_in = None
+        self._scratch = np.zeros((0, CHANNELS), dtype=np.float32)
+        self._ended_at = None
+        self.last_transition_gap = None   # seconds of silence between songs
+
+        # Called from the audio thread; keep them cheap (e.g. a Qt signal emit)
+        self.on_finished = None
+        self.on_near_end = None
+        self.near_end_seconds = 0.0
+        self._near_end_sent = False
+
+        self.stream = sd.OutputStream(
+            samplerate=self.SAMPLE_RATE,
+            channels=self.CHANNELS,
+            dtype="float32",
+            callback=self._audio_callback,
+        )
+        self.stream.start()
 
     # -----------------------------
     #   Load audio files
     # -----------------------------
     def load_instrumental(self, path: str):
-        if not path or not os.path.exists(path):
-            self.instrumental = None
-            return
-        audio = AudioSegment.from_file(path).set_channels(2).set_frame_rate(44100)
-        audio.export("temp_instrumental.wav", format="wav")
-        self.instrumental = pygame.mixer.Sound("temp_instrumental.wav")
+        stem = open_stem(path, self.streaming)
+        with self._lock:
+            old, self.instrumental = self.instrumental, stem
+        if old is not None:
+            old.close()
 
     def load_vocals(self, path: str):
-        if not path or not os.path.exists(path):
-            self.vocals = None
-            return
-        audio = AudioSegment.from_file(path).set_channels(2).set_frame_rate(44100)
-        audio.export("temp_vocal.wav", format="wav")
-        self.vocals = pygame.mixer.Sound("temp_vocal.wav")
+        stem = open_stem(path, self.streaming)
+        with self._lock:
+            old, self.vocals = self.vocals, stem
+        if old is not None:
+            old.close()
+
+    def load_prepared(self, prepared: PreparedAudio):
+        """Swap in stems that were opened ahead of time; takes ownership."""
+        with self._lock:
+            old = (self.instrumental, self.vocals)
+            self.instrumental, self.vocals = prepared.instrumental, prepared.vocals
+            prepared.instrumental = prepared.vocals = None
+        for stem in old:
+            if stem is not None:
+                stem.close()
+
+    def crossfade_to(self, prepared: PreparedAudio, seconds: float):
+        """Install the next song's stems while the current ones fade out.
+
+        The new song starts on the next play(); if nothing is playing this is
+        the same as load_prepared().
+        """
+        total = int(seconds * self.SAMPLE_RATE)
+        retired = []
+        with self._lock:
+            if self._fade is not None:
+                retired += [self._fade["instrumental"], self._fade["vocals"]]
+                self._fade = None
+            if self._playing and not self.paused and total > 0 and self.instrumental is not None:
+                self._fade = {
+                    "instrumental": self.instrumental,
+                    "vocals": self.vocals,
+                    "cursor": self._cursor,
+                    "done": 0,
+                    "total": total,
+                    "vocal_volume": self.vocal_volume,
+                }
+                self._fade_in = (0, total)
+            else:
+                retired += [self.instrumental, self.vocals]
+            self.instrumental, self.vocals = prepared.instrumental, prepared.vocals
+            prepared.instrumental = prepared.vocals = None
+            self._playing = False
+            self._cursor = 0
+        for stem in retired:
+            if stem is not None:
+                stem.close()
+
+    def _length_frames(self):
+        if self.instrumental is not None:
+            return self.instrumental.frames
+        return 0
+
+    # -----------------------------
+    #   Output callback
+    # -----------------------------
+    def _mix_stems(self, out, instrumental, vocals, start, n, vocal_volume):
+        """Write `n` frames of instrumental + scaled vocals from `start` into `out`."""
+        inst = instrumental.read(start, n)
+        out[:len(inst)] = inst
+        if self.instrumental_gain != 1.0:
+            out[:len(inst)] *= self.instrumental_gain
+        if vocals is not None and vocal_volume > 0:
+            voc = vocals.read(start, n)
+            voc *= vocal_volume
+            out[:len(voc)] += voc
+
+    @staticmethod
+    def _ramp(done, total, n):
+        """Linear 0..1 gain for frames [done, done + n) of a `total`-frame fade."""
+        return (np.arange(done, done + n, dtype=np.float32) / total).clip(0.0, 1.0)[:, None]
+
+    def _render_fade(self, outdata, frames):
+        """Add the fading-out song; returns its stems once the fade is over."""
+        fade = self._fade
+        n = min(frames, fade["total"] - fade["done"], fade["instrumental"].frames - fade["cursor"])
+        if n > 0:
+            if len(self._scratch) < n:
+                self._scratch = np.zeros((n, CHANNELS), dtype=np.float32)
+            buf = self._scratch[:n]
+            buf.fill(0)
+            self._mix_stems(buf, fade["instrumental"], fade["vocals"], fade["cursor"], n, fade["vocal_volume"])
+            buf *= 1.0 - self._ramp(fade["done"], fade["total"], n)
+            outdata[:n] += buf
+            fade["cursor"] += n
+            fade["done"] += n
+        if n <= 0 or fade["done"] >= fade["total"]:
+            self._fade = None
+            return fade["instrumental"], fade["vocals"]
+        return ()
+
+    def _audio_callback(self, outdata, frames, time, status):
+        if status:
+            print("Audio status:", status)
+        outdata.fill(0)
+        finished = near_end = False
+        retired = ()
+        with self._lock:
+            if not self.paused:
+                retired, finished, near_end = self._render_song(outdata, frames, time)
+
+        if self._inputs:
+            self._mix_inputs(outdata, frames)
+
+        for stem in retired:
+            if stem is not None:
+                stem.close()
+        if finished and self.on_finished:
+            self.on_finished()
+        if near_end and self.on_near_end:
+            self.on_near_end()
+
+    def _render_song(self, outdata, frames, time):
+        """Mix the current (and fading-out) song; called with the lock held."""
+        finished = near_end = False
+        retired = ()
+        if self._playing:
+            start = self._cursor
+            length = self._length_frames()
+            end = min(start + frames, length)
+            n = end - start
+            if n > 0:
+                self._mix_stems(outdata, self.instrumental, self.vocals, start, n, self.vocal_volume)
+                if self._fade_in is not None:
+                    done, total = self._fade_in
+                    outdata[:n] *= self._ramp(done, total, n)
+                    self._fade_in = (done + n, total) if done + n < total else None
+                if self._ended_at is not None:
+                    self.last_transition_gap = _time.perf_counter() - self._ended_at
+                    self._ended_at = None
+                self._cursor = end
+                self._clock = (start, time.outputBufferDacTime or None, n)
+
+            remaining = length - self._cursor
+            if remaining <= 0:
+                self._playing = False
+                self._ended_at = _time.perf_counter()
+                finished = True
+            elif (not self._near_end_sent and self.near_end_seconds > 0
+                  and remaining <= self.near_end_seconds * self.SAMPLE_RATE):
+                self._near_end_sent = True
+                near_end = True
+
+        if self._fade is not None:
+            retired = self._render_fade(outdata, frames)
+        return retired, finished, near_end
+
+    def _mix_inputs(self, outdata, frames):
+        """Add every live input (mono) to both channels at its gain."""
+        if len(self._input_buf) < frames:
+            self._input_buf = np.zeros(frames, dtype=np.float32)
+        buf = self._input_buf[:frames]
+        mixed = False
+        for source, gain in self._inputs.values():
+            if gain <= 0:
+                continue
+            buf.fill(0)
+            if source.mix_into(buf):
+                buf *= gain
+                outdata += buf[:, None]
+                mixed = True
+        if mixed:
+            np.clip(outdata, -1.0, 1.0, out=outdata)
+
+    # -----------------------------
+    #   Live inputs
+    # -----------------------------
+    def add_input(self, name: str, source, gain: float = 1.0):
+        """Mix `source` (anything with mix_into(mono_out)) into the output."""
+        self._inputs = {**self._inputs, name: (source, gain)}
+
+    def remove_input(self, name: str):
+        self._inputs = {k: v for k, v in self._inputs.items() if k != name}
+
+    def set_input_gain(self, name: str, gain: float):
+        if name in self._inputs:
+            self._inputs = {**self._inputs, name: (self._inputs[name][0], max(0.0, gain))}
 
     # -----------------------------
     #   Playback control
     # -----------------------------
     def play(self):
-        if self.instrumental:
-            pygame.mixer.Channel(0).play(self.instrumental)
-        if self.vocals:
-            pygame.mixer.Channel(1).play(self.vocals)
-            pygame.mixer.Channel(1).set_volume(1.0 if self.vocal_enabled else 0.0)
+        with self._lock:
+            self._cursor = 0
+            self._clock = (0, None, 0)
+            self._near_end_sent = False
+            self.paused = False
+            self._playing = self.instrumental is not None
+
+    def pop_transition_gap(self):
+        """Return the last measured song-to-song gap (seconds) once, else None."""
+        gap, self.last_transition_gap = self.last_transition_gap, None
+        return gap
 
     def pause(self):
-        pygame.mixer.pause()
-        self.paused = True
+        # Freeze the clock where the listener actually is. Under the lock, so a
+        # callback already rendering can't overwrite the frozen clock after us.
+        with self._lock:
+            position = self.get_position()
+            self.paused = True
+            self._clock = (int(position * self.SAMPLE_RATE), None, 0)
 
     def resume(self):
-        pygame.mixer.unpause()
-        self.paused = False
+        with self._lock:
+            self.paused = False
 
     def stop(self):
-        pygame.mixer.stop()
+        with self._lock:
+            self._playing = False
+            self._cursor = 0
+            self._clock = (0, None, 0)
+            self._fade_in = None
+            fade, self._fade = self._fade, None
+        if fade is not None:
+            for stem in (fade["instrumental"], fade["vocals"]):
+                if stem is not None:
+                    stem.close()
+
+    def close(self):
+        self.stop()
+        try:
+            self.stream.stop()
+            self.stream.close()
+        except Exception:
+            pass
 
     def set_vocal_volume(self, volume: float):
         self.vocal_enabled = volume > 0
-        if self.vocals:
-            pygame.mixer.Channel(1).set_volume(volume)
+        self.vocal_volume = volume
 
     def is_playing(self):
-        # Playing if channel is active AND not paused
-        try:
-            busy = pygame.mixer.Channel(0).get_busy()
-        except Exception:
-            busy = False
-        return busy and not self.paused
+        # Playing if the cursor is still running AND not paused
+        return self._playing and not self.paused
 
     def get_position(self):
-        """Return current playback time of instrumental in seconds."""
-        channel = pygame.mixer.Channel(0)
-        if self.instrumental and channel.get_busy():
-            # pygame doesn't give exact time, so track manually with a timer
-            return getattr(self, "_position", 0.0)
-        return 0.0
+        """Return current playback time of instrumental in seconds.
+
+        Derived from the frames handed to the device, interpolated against
+        the stream clock between callbacks. Cheap enough to poll every tick.
+        """
+        frames, dac_time, span = self._clock
+        position = frames / self.SAMPLE_RATE
+        if dac_time is not None and self.is_playing():
+            try:
+                elapsed = self.stream.time - dac_time
+            except Exception:
+                elapsed = 0.0
+            # Audio before dac_time is still in the device buffer
+            elapsed = min(max(elapsed, -self.stream.latency), span / self.SAMPLE_RATE)
+            position += elapsed
+        return min(max(position, 0.0), self.get_length())
 
     def get_length(self):
         """Return total length of instrumental in seconds."""
-        if self.instrumental:
-            return self.instrumental.get_length()
-        return 0.0
+        return self._length_frames() / self.SAMPLE_RATE
 
     def seek(self, seconds):
-        """Jump to a certain position in the instrumental AND vocal tracks."""
-        # --- Stop playback ---
-        pygame.mixer.Channel(0).stop()
-        pygame.mixer.Channel(1).stop()
-
-        # --- Reload instrumental ---
-        if self.instrumental:
-            inst_audio = AudioSegment.from_file("temp_instrumental.wav")
-            inst_audio = inst_audio[seconds*1000:]  # milliseconds
-            inst_audio.export("temp_instrumental_seek.wav", format="wav")
-            self.instrumental = pygame.mixer.Sound("temp_instrumental_seek.wav")
-
-        # --- Reload vocals ---
-        if self.vocals:
-            voc_audio = AudioSegment.from_file("temp_vocal.wav")
-            voc_audio = voc_audio[seconds*1000:]
-            voc_audio.export("temp_vocal_seek.wav", format="wav")
-            self.vocals = pygame.mixer.Sound("temp_vocal_seek.wav")
-
-        # --- Resume playback ---
-        self.play()
+        """Jump to a certain position in the instrumental AND vocal tracks.
+
+        Only the shared read cursor moves; nothing is decoded or written.
+        """
+        with self._lock:
+            length = self._length_frames()
+            if not length:
+                return
+            self._cursor = min(max(int(seconds * self.SAMPLE_RATE), 0), length)
+            self._clock = (self._cursor, None, 0)
+            self._near_end_sent = False
+            self._playing = self._cursor < length
 
 if __name__ == "__main__":
     mixer = AudioMixer()
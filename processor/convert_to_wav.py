@@ -1,6 +1,7 @@
 import os
 import subprocess
 import tempfile
+import numpy as np
 from utils.filename_safety import safe_name_long
 
 def convert_to_wav(input_path: str) -> tuple[str, str]:
@@ -26,3 +27,23 @@ def convert_to_wav(input_path: str) -> tuple[str, str]:
 
     print(f"✅ Converted to WAV: {wav_path}")
     return wav_path, safe_base
+
+
+def decode_audio(input_path: str, samplerate: int = 44100, channels: int = 2) -> np.ndarray:
+    """
+    Decodes any audio/video input straight to memory through an ffmpeg pipe,
+    without writing an intermediate WAV.
+    Returns float32 array shaped (channels, frames).
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+
+    cmd = [
+        "ffmpeg", "-v", "error", "-i", input_path,
+        "-f", "f32le", "-acodec", "pcm_f32le",
+        "-ar", str(samplerate), "-ac", str(channels), "pipe:1",
+    ]
+    proc = subprocess.run(cmd, check=True, stdout=subprocess.PIPE)
+
+    audio = np.frombuffer(proc.stdout, dtype=np.float32)
+    return audio.reshape(-1, channels).T
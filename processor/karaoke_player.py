@@ -4,7 +4,6 @@ import sys
 from yt_dlp import YoutubeDL
 from pydub import AudioSegment
 import vlc
-import pygame
 import socket
 import qrcode
 
@@ -44,10 +43,12 @@ def generate_qr_pixmap(port=5005):
 
 class KaraokePlayer(QWidget):
     finished = Signal()
+    ending_soon = Signal()      # crossfade window of the current song reached
+    _audio_finished = Signal()  # re-emitted from the audio thread
 
-    def __init__(self, instrumental_path, lyrics_segments, vocal_path=None, video_path=None, video_url=None):
+    def __init__(self, instrumental_path, lyrics_segments, vocal_path=None, video_path=None, video_url=None,
+                 audio_mixer=None):
         super().__init__()
-        pygame.mixer.init()
         self.instrumental_path = instrumental_path
         self.vocal_path = vocal_path
         self.lyrics_segments = lyrics_segments
@@ -67,9 +68,23 @@ class KaraokePlayer(QWidget):
 
         # UI setup
         self._setup_ui()
-        self.audio_mixer = AudioMixer()
+        # Pass the app's mixer in so remote mics share the one output stream
+        self.audio_mixer = audio_mixer or AudioMixer()
+        # Song end is pushed from the audio callback instead of polled
+        self.audio_mixer.on_finished = self._audio_finished.emit
+        self.audio_mixer.on_near_end = self.ending_soon.emit
+        self._audio_finished.connect(self._on_audio_finished)
         self._prepare_audio_files()
 
+    @property
+    def crossfade_seconds(self):
+        return self.audio_mixer.near_end_seconds
+
+    @crossfade_seconds.setter
+    def crossfade_seconds(self, seconds):
+        """Emit ending_soon this many seconds before the end (0 disables)."""
+        self.audio_mixer.near_end_seconds = max(0.0, float(seconds))
+
     def _toggle_borderless(self):
         if self.isFullScreen():
             # Switch to normal window with borders and Windows taskbar
@@ -305,10 +320,17 @@ class KaraokePlayer(QWidget):
     # ------------------------------------------------------------
     # Audio & Video
     # ------------------------------------------------------------
-    def load_song(self, instrumental_path, lyrics_segments, vocal_path=None, video_url=None, video_path=None):
-        """Load a new song into the existing player without reopening the window."""
+    def load_song(self, instrumental_path, lyrics_segments, vocal_path=None, video_url=None, video_path=None,
+                  prepared_audio=None, crossfade=0.0):
+        """Load a new song into the existing player without reopening the window.
+
+        `prepared_audio` is an optional PreparedAudio for the same files,
+        which skips opening/decoding the stems here. With `crossfade` > 0 the
+        current song keeps playing and fades out under the new one.
+        """
         # Stop current playback and reset internal lyric state
-        self.stop()
+        crossfade = crossfade if (prepared_audio and self.audio_mixer.is_playing()) else 0.0
+        self.stop(keep_audio=crossfade > 0)
 
         self.instrumental_path = instrumental_path
         self.vocal_path = vocal_path
@@ -333,21 +355,24 @@ class KaraokePlayer(QWidget):
         else:
             self.lyrics_bottom_right.setText("")
 
-        self._prepare_audio_files()
+        self._prepare_audio_files(prepared_audio, crossfade)
         self.start()  # Start playing new song
 
-    def _prepare_audio_files(self):
-        # Use AudioMixer to load files
-        if self.instrumental_path:
-            self.audio_mixer.load_instrumental(self.instrumental_path)
-        if self.vocal_path:
+    def _prepare_audio_files(self, prepared_audio=None, crossfade=0.0):
+        # Use AudioMixer to load files (or the stems warmed up by the queue)
+        if prepared_audio and prepared_audio.matches(self.instrumental_path, self.vocal_path):
+            if crossfade > 0:
+                self.audio_mixer.crossfade_to(prepared_audio, crossfade)
+            else:
+                self.audio_mixer.load_prepared(prepared_audio)
+        else:
+            if prepared_audio:
+                prepared_audio.close()
+            if self.instrumental_path:
+                self.audio_mixer.load_instrumental(self.instrumental_path)
+            # Always reload so a song without vocals doesn't keep the last one's
             self.audio_mixer.load_vocals(self.vocal_path)
-
-        # --- Audio playback using AudioMixer ---
-        if self.instrumental_path:
-            self.audio_mixer.play()
-            if not self.vocal_enabled:
-                self.audio_mixer.set_vocal_volume(0.0)
+        # Playback itself starts in _play_media()
 
     def _download_video(self):
         if not self.video_url:
@@ -475,8 +500,7 @@ class KaraokePlayer(QWidget):
 
         # Stop audio
         try:
-            import pygame
-            pygame.mixer.stop()
+            self.audio_mixer.stop()
         except Exception:
             pass
 
@@ -495,12 +519,26 @@ class KaraokePlayer(QWidget):
         # Emit finished so main GUI knows to play next song
         self.finished.emit()
 
+    def _on_audio_finished(self):
+        """The mixer ran out of audio: finish right away instead of on the next poll."""
+        if not self.playing:
+            return
+        if self.player.is_playing():
+            self.player.stop()
+        self.timer.stop()
+        self.playing = False
+        for lbl in self.labels:
+            lbl.setText("")
+        self.progress_bar.set_progress(0.0)
+        self.finished.emit()
+
     def _on_progress_clicked(self, fraction):
         # Determine target time
-        if self.video_path and self.player.get_length() > 0:
-            duration = self.player.get_length() / 1000.0
-        elif self.audio_mixer.get_length() > 0:
+        # Same timeline as the progress bar: audio first, then video
+        if self.audio_mixer.get_length() > 0:
             duration = self.audio_mixer.get_length()
+        elif self.video_path and self.player.get_length() > 0:
+            duration = self.player.get_length() / 1000.0
         else:
             return
 
@@ -510,8 +548,8 @@ class KaraokePlayer(QWidget):
         if self.video_path:
             self.player.set_time(int(target_time * 1000))
 
-        # Seek audio
-        if self.audio_mixer.is_playing():
+        # Seek audio (a cursor move, so it works while paused too)
+        if self.audio_mixer.get_length() > 0:
             self.audio_mixer.seek(target_time)
 
         # Update lyrics
@@ -539,15 +577,24 @@ class KaraokePlayer(QWidget):
             self.timer.stop()
             return
 
+        gap = self.audio_mixer.pop_transition_gap()
+        if gap is not None:
+            write_debug(f"Song transition gap: {gap * 1000:.1f} ms")
+
         # -------------------------
         # Determine elapsed time
         # -------------------------
-        if self.video_path and self.player.is_playing():
+        # The mixer's sample clock is the master; VLC is only used when
+        # there is no audio loaded.
+        if self.audio_mixer.get_length() > 0:
+            elapsed = self.audio_mixer.get_position()
+            duration = self.audio_mixer.get_length()
+        elif self.video_path and self.player.is_playing():
             elapsed = self.player.get_time() / 1000.0  # VLC gives milliseconds
             duration = self.player.get_length() / 1000.0 if self.player.get_length() > 0 else 1.0
         else:
-            elapsed = self.audio_mixer.get_position()  # implement this to return seconds
-            duration = self.audio_mixer.get_length() or 1.0  # in seconds
+            elapsed = 0.0
+            duration = 1.0
 
         # -------------------------
         # Update progress bar
@@ -634,8 +681,9 @@ class KaraokePlayer(QWidget):
         self._play_media()
         self.show()
 
-    def stop(self):
-        self.audio_mixer.stop()
+    def stop(self, keep_audio=False):
+        if not keep_audio:
+            self.audio_mixer.stop()
         if self.player.is_playing():
             self.player.stop()
         self.timer.stop()
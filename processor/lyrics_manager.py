@@ -1,14 +1,19 @@
 import os
 from pathlib import Path
-import whisper
 import numpy as np
 import librosa
-from cache.cache_manager import CacheManager
+from processor.transcription_service import TranscriptionService
 
 class LyricsManager:
-    def __init__(self, model_name="medium"):
-        self.model = whisper.load_model(model_name)
-        self.cache = CacheManager()
+    def __init__(self, model_name=None, backend=None):
+        """
+        backend: one of BACKENDS ("whisper", "faster-whisper"); model_name:
+        model tier ("medium", "small", ...). None uses the service defaults.
+        The model itself is loaded once per process by the shared service.
+        """
+        self.model_name = model_name
+        self.backend = backend
+        self.service = TranscriptionService.instance()
 
     def transcribe(self, vocals_path: str, song_dir: Path, title: str, artist: str):
         """
@@ -18,11 +23,11 @@ class LyricsManager:
         if not os.path.exists(vocals_path):
             raise FileNotFoundError(f"{vocals_path} not found.")
 
-        # Check cache
-        cached = self.cache.check_existing(title, artist)
-        if cached and Path(cached["lyrics"]).exists():
+        # Check cache (song_dir is the song's cache folder)
+        cached_lrc = Path(song_dir) / "lyrics.lrc"
+        if cached_lrc.exists():
             print(f"🎵 Using cached lyrics for '{title}' by '{artist}'")
-            return self._load_lrc(cached["lyrics"]), Path(cached["lyrics"])
+            return self._load_lrc(cached_lrc), cached_lrc
 
         # Detect first non-silent frame
         y, sr = librosa.load(vocals_path, sr=44100)
@@ -41,14 +46,15 @@ class LyricsManager:
         sf.write(temp_path, y_sliced, sr)
 
         # Transcribe
-        result = self.model.transcribe(
-            str(temp_path),
+        segments = self.service.transcribe(
+            temp_path,
+            backend=self.backend,
+            model_name=self.model_name,
             fp16=False,
             temperature=0.0,
             word_timestamps=False,
             no_speech_threshold=0.2
         )
-        segments = result.get("segments", [])
 
         # Offset timestamps by first_time
         for seg in segments:
@@ -73,12 +79,17 @@ class LyricsManager:
         return lrc_path
 
     def _load_lrc(self, lrc_path: str):
-        segments = []
-        with open(lrc_path, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.startswith("["):
-                    time_part, text = line.strip().split("]", 1)
-                    min_sec = time_part[1:].split(":")
-                    start = float(min_sec[0]) * 60 + float(min_sec[1])
-                    segments.append({"start": start, "end": start + 5.0, "text": text})
-        return segments
+        return load_lrc(lrc_path)
+
+
+def load_lrc(lrc_path: str):
+    """Parse a .lrc file into segments (no model needed)."""
+    segments = []
+    with open(lrc_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("["):
+                time_part, text = line.strip().split("]", 1)
+                min_sec = time_part[1:].split(":")
+                start = float(min_sec[0]) * 60 + float(min_sec[1])
+                segments.append({"start": start, "end": start + 5.0, "text": text})
+    return segments
@@ -0,0 +1,225 @@
+# processor/prepare_scheduler.py
+
+import itertools
+import threading
+from PySide6.QtCore import QObject, Signal
+from processor.worker import SongJob, PreparationCancelled, song_key
+from utils.debug_log import write_debug
+
+# Stage name -> number of threads. Network stages are wide, Demucs and
+# Whisper saturate the CPU on their own.
+STAGES = {
+    "download": 4,
+    "separate": 1,
+    "transcribe": 1,
+    "video": 2,
+}
+
+# A new job enters both branches at once: the audio chain and the video
+# download. NEXT_STAGE maps each stage to the next one in its branch
+# (None = branch done).
+ENTRY_STAGES = ("download", "video")
+NEXT_STAGE = {
+    "download": "separate",
+    "separate": "transcribe",
+    "transcribe": None,
+    "video": None,
+}
+
+
+class StageQueue:
+    """
+    Work queue whose get() returns the waiting job with the lowest
+    `priority`, read at pop time so re-prioritising queued jobs works.
+    """
+
+    def __init__(self):
+        self._items = []
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+
+    def put(self, job):
+        with self._cond:
+            self._items.append((next(self._seq), job))
+            self._cond.notify()
+
+    def get(self):
+        with self._cond:
+            while not self._items:
+                self._cond.wait()
+            entry = min(self._items, key=lambda e: (e[1].priority, e[0]))
+            self._items.remove(entry)
+            return entry[1]
+
+
+class PrepareScheduler(QObject):
+    """
+    Prepares the first `lookahead` queued songs as a pipeline.
+
+    Download, separation, transcription and video download are independent
+    stages, each with its own thread pool and StageQueue, so song B
+    downloads while song A is in Demucs and song C transcribes. The video
+    download starts together with the audio download and is joined at the
+    end, keeping it off the critical path. Queue
+    position is the priority in every stage; songs removed from the queue
+    are cancelled at their next stage boundary.
+    """
+    prepared = Signal(dict)   # result dict (see SongJob.finish), incl. "key"
+    status = Signal(str)
+    error = Signal(str)
+
+    # Emitted from stage threads, handled on the GUI thread
+    _job_done = Signal(object, dict)
+    _job_failed = Signal(object, str)
+    _job_dropped = Signal(object)
+
+    # A failure is retried once (e.g. a transient network error)
+    MAX_ATTEMPTS = 2
+
+    def __init__(self, cache, lookahead=3):
+        super().__init__()
+        self.cache = cache
+        self.lookahead = lookahead
+        self.jobs = {}      # key -> SongJob in flight
+        self.results = {}   # key -> prepared result
+        self.failed = {}    # key -> failed attempts, while the song stays queued
+        self._queue = []    # last queue passed to sync()
+
+        self._job_done.connect(self._on_done)
+        self._job_failed.connect(self._on_failed)
+        self._job_dropped.connect(self._on_dropped)
+
+        self.queues = {name: StageQueue() for name in STAGES}
+        for name, threads in STAGES.items():
+            for i in range(threads):
+                threading.Thread(
+                    target=self._stage_loop, args=(name,), name=f"prepare-{name}-{i}", daemon=True
+                ).start()
+
+    # -------------------------
+    # Stage threads
+    # -------------------------
+    def _stage_loop(self, name):
+        while True:
+            job = self.queues[name].get()
+            error = None
+            try:
+                job.check_cancelled()
+                if name == "download":
+                    if job.load_cached() is None:
+                        job.download_audio()
+                elif name == "separate":
+                    job.separate()
+                elif name == "transcribe":
+                    job.transcribe()
+                elif name == "video":
+                    job.download_video()
+
+                next_stage = NEXT_STAGE[name]
+                if next_stage and job.cached_result is None:
+                    self.queues[next_stage].put(job)
+                    continue
+            except PreparationCancelled:
+                pass
+            except Exception as e:
+                error = str(e)
+            self._branch_finished(job, error)
+
+    def _branch_finished(self, job, error=None):
+        """Runs on a stage thread; the last branch to finish reports the job."""
+        if not job.branch_done(error):
+            return
+        if job.confirm_cancelled():
+            job.on_status("Cancelled")
+            self._job_dropped.emit(job)
+        elif job.errors:
+            self._job_failed.emit(job, job.errors[0])
+        else:
+            try:
+                result = job.result()
+            except Exception as e:
+                self._job_failed.emit(job, str(e))
+                return
+            self._job_done.emit(job, result)
+
+    # -------------------------
+    # GUI thread
+    # -------------------------
+    def sync(self, queue):
+        """Match in-flight work to the current queue order."""
+        self._queue = list(queue)
+        positions = {}
+        for i, song in enumerate(queue):
+            positions.setdefault(song_key(song), i)
+
+        # Cancel / drop songs that left the queue
+        for key, job in self.jobs.items():
+            if key not in positions:
+                job.cancel()
+        for key in list(self.results):
+            if key not in positions:
+                self._discard(self.results.pop(key))
+        # Re-queuing a song after removal gives it a fresh set of attempts
+        self.failed = {key: n for key, n in self.failed.items() if key in positions}
+
+        # Re-prioritise and start the lookahead window
+        for key, pos in positions.items():
+            job = self.jobs.get(key)
+            if job:
+                job.priority = pos
+                # Removed and re-queued mid-stage: keep going if the job hasn't
+                # stopped yet; otherwise _on_dropped restarts it via _resync
+                if job.is_cancelled():
+                    job.uncancel()
+            elif (pos < self.lookahead and key not in self.results
+                  and self.failed.get(key, 0) < self.MAX_ATTEMPTS):
+                self._start(queue[pos], pos)
+
+    def _resync(self):
+        self.sync(self._queue)
+
+    def _start(self, song, priority):
+        title = song.get("title", "")
+        job = SongJob(song, self.cache, priority=priority,
+                      on_status=lambda s: self.status.emit(f"[{title}] {s}"))
+        self.jobs[job.key] = job
+        write_debug(f"Scheduler: preparing {job.key} (priority {priority})")
+        for stage in ENTRY_STAGES:
+            self.queues[stage].put(job)
+
+    def _forget(self, job):
+        if self.jobs.get(job.key) is job:
+            del self.jobs[job.key]
+
+    def _on_dropped(self, job):
+        self._forget(job)
+        self._resync()
+
+    def _on_done(self, job, result):
+        self._forget(job)
+        if job.is_cancelled():
+            self._discard(result)
+        else:
+            self.results[job.key] = result
+            self.prepared.emit(result)
+        self._resync()
+
+    def _on_failed(self, job, message):
+        self._forget(job)
+        self.failed[job.key] = self.failed.get(job.key, 0) + 1
+        if self.failed[job.key] >= self.MAX_ATTEMPTS:
+            self.error.emit(f"{job.title}: {message}")
+        else:
+            write_debug(f"Scheduler: retrying {job.key} after error: {message}")
+        self._resync()
+
+    def _discard(self, result):
+        if result.get("audio"):
+            result["audio"].close()
+
+    def peek(self, song):
+        return self.results.get(song_key(song))
+
+    def take(self, song):
+        """Hand a prepared result to the caller (who then owns its audio)."""
+        return self.results.pop(song_key(song), None)
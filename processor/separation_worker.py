@@ -0,0 +1,129 @@
+# processor/separation_worker.py
+
+import atexit
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+from utils.debug_log import write_debug
+
+
+def _serve(model_name, jobs, results):
+    """Child process: load Demucs once, then separate jobs until told to stop."""
+    try:
+        import torch
+        from demucs.pretrained import get_model
+        from demucs.apply import apply_model
+        from demucs.audio import save_audio
+        from processor.convert_to_wav import decode_audio
+
+        start = time.perf_counter()
+        model = get_model(model_name)
+        model.eval()
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        model.to(device)
+        results.put(("ready", None, time.perf_counter() - start))
+    except Exception as e:
+        results.put(("failed", None, str(e)))
+        return
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, audio_path, instrumental_path, vocals_path = job
+        try:
+            # ffmpeg decodes the download straight into the input tensor
+            wav = torch.from_numpy(
+                decode_audio(audio_path, samplerate=model.samplerate, channels=model.audio_channels).copy()
+            )
+            # Same normalisation as `python -m demucs`
+            ref = wav.mean(0)
+            wav = (wav - ref.mean()) / ref.std()
+            with torch.no_grad():
+                sources = apply_model(model, wav[None], device=device, split=True, overlap=0.25, progress=False)[0]
+            sources = sources * ref.std() + ref.mean()
+
+            vocals = sources[model.sources.index("vocals")]
+            no_vocals = sources.sum(0) - vocals  # --two-stems vocals
+            save_audio(no_vocals.cpu(), instrumental_path, samplerate=model.samplerate)
+            save_audio(vocals.cpu(), vocals_path, samplerate=model.samplerate)
+            results.put(("ok", job_id, (instrumental_path, vocals_path)))
+        except Exception as e:
+            results.put(("error", job_id, str(e)))
+
+
+class SeparationWorker:
+    """
+    Resident Demucs process. Keeps the model loaded between songs so
+    back-to-back separations skip interpreter start, torch import and model
+    load. Jobs are handled one at a time.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, model_name="htdemucs"):
+        self.model_name = model_name
+        self._ctx = mp.get_context("spawn")
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._process = None
+        self.load_time = None
+
+    @classmethod
+    def instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                atexit.register(cls._instance.shutdown)
+            return cls._instance
+
+    def _ensure_started(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        self._jobs = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._process = self._ctx.Process(
+            target=_serve, args=(self.model_name, self._jobs, self._results), daemon=True
+        )
+        self._process.start()
+
+        kind, _, payload = self._wait_result()
+        if kind != "ready":
+            self._process = None
+            raise RuntimeError(f"Separation worker failed to start: {payload}")
+        self.load_time = payload
+        print(f"🧠 Demucs worker ready ({self.model_name}, loaded in {payload:.1f}s)")
+        write_debug(f"Demucs worker loaded {self.model_name} in {payload:.2f}s")
+
+    def _wait_result(self):
+        while True:
+            try:
+                return self._results.get(timeout=1.0)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    self._process = None
+                    raise RuntimeError("Separation worker exited unexpectedly")
+
+    def separate(self, audio_path, instrumental_path, vocals_path):
+        """Separate any ffmpeg-readable `audio_path` and write both stems; returns their paths."""
+        with self._lock:
+            self._ensure_started()
+            job_id = next(self._ids)
+            start = time.perf_counter()
+            self._jobs.put((job_id, str(audio_path), str(instrumental_path), str(vocals_path)))
+            kind, result_id, payload = self._wait_result()
+            if kind != "ok" or result_id != job_id:
+                raise RuntimeError(f"Separation failed: {payload}")
+            write_debug(f"Demucs job {audio_path} took {time.perf_counter() - start:.2f}s")
+            return payload
+
+    def shutdown(self):
+        if self._process is not None and self._process.is_alive():
+            try:
+                self._jobs.put(None)
+                self._process.join(timeout=5)
+            except Exception:
+                pass
+        self._process = None
@@ -0,0 +1,115 @@
+# processor/transcription_service.py
+
+import os
+import threading
+import time
+from utils.debug_log import write_debug
+
+# Override on CPU-only boxes, e.g. KARAOKE_TRANSCRIBE_BACKEND=faster-whisper
+DEFAULT_BACKEND = os.environ.get("KARAOKE_TRANSCRIBE_BACKEND", "whisper")
+DEFAULT_MODEL = os.environ.get("KARAOKE_WHISPER_MODEL", "medium")
+
+
+class WhisperBackend:
+    """openai-whisper (PyTorch). Accurate, slow on CPU."""
+    name = "whisper"
+
+    def __init__(self, model_name):
+        import whisper
+        self.model = whisper.load_model(model_name)
+
+    def transcribe(self, audio_path, **options):
+        result = self.model.transcribe(str(audio_path), **options)
+        return result.get("segments", [])
+
+
+class FasterWhisperBackend:
+    """faster-whisper (CTranslate2) with int8 weights on CPU."""
+    name = "faster-whisper"
+
+    def __init__(self, model_name, compute_type="int8"):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model_name, device="cpu", compute_type=compute_type)
+
+    def transcribe(self, audio_path, temperature=0.0, no_speech_threshold=0.6,
+                   word_timestamps=False, **_ignored):
+        # fp16 and other openai-whisper-only options don't apply here
+        segments, _info = self.model.transcribe(
+            str(audio_path),
+            temperature=temperature,
+            no_speech_threshold=no_speech_threshold,
+            word_timestamps=word_timestamps,
+        )
+        # Same shape as openai-whisper segments for everything downstream
+        return [
+            {"id": i, "start": seg.start, "end": seg.end, "text": seg.text}
+            for i, seg in enumerate(segments)
+        ]
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+class TranscriptionService:
+    """
+    Process-wide transcription service: loads each backend/model once and
+    serves transcription jobs from every worker thread, one at a time.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._backends = {}
+        self._load_lock = threading.Lock()
+        self._job_lock = threading.Lock()  # one job at a time on the shared model
+        self.load_times = {}               # "backend:model" -> seconds to load
+        self.job_times = []                # seconds per transcription job
+
+    @classmethod
+    def instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def get_backend(self, backend=None, model_name=None):
+        backend = backend or DEFAULT_BACKEND
+        model_name = model_name or DEFAULT_MODEL
+        key = f"{backend}:{model_name}"
+        with self._load_lock:
+            engine = self._backends.get(key)
+            if engine is None:
+                if backend not in BACKENDS:
+                    raise ValueError(f"Unknown transcription backend: {backend}")
+                start = time.perf_counter()
+                engine = BACKENDS[backend](model_name)
+                elapsed = time.perf_counter() - start
+                self._backends[key] = engine
+                self.load_times[key] = elapsed
+                print(f"🧠 Loaded {key} in {elapsed:.1f}s")
+                write_debug(f"Transcription model {key} loaded in {elapsed:.2f}s")
+            return engine
+
+    def transcribe(self, audio_path, backend=None, model_name=None, **options):
+        """Run a transcription job on the shared model; returns whisper-style segments."""
+        engine = self.get_backend(backend, model_name)
+        with self._job_lock:
+            start = time.perf_counter()
+            segments = engine.transcribe(audio_path, **options)
+            elapsed = time.perf_counter() - start
+        self.job_times.append(elapsed)
+        print(f"📝 Transcribed {audio_path} in {elapsed:.1f}s")
+        write_debug(f"Transcription job {audio_path} took {elapsed:.2f}s")
+        return segments
+
+    def stats(self):
+        jobs = self.job_times
+        return {
+            "load_times": dict(self.load_times),
+            "jobs": len(jobs),
+            "avg_job_seconds": (sum(jobs) / len(jobs)) if jobs else None,
+            "last_job_seconds": jobs[-1] if jobs else None,
+        }
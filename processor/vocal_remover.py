@@ -5,6 +5,7 @@ import sys
 import subprocess
 import shutil
 from processor.convert_to_wav import convert_to_wav
+from processor.separation_worker import SeparationWorker
 from cache.cache_manager import CacheManager
 from utils.filename_safety import safe_name_long
 
@@ -25,12 +26,25 @@ class VocalRemover:
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"Input file not found: {audio_path}")
 
-        # Convert input to WAV first
-        safe_wav_path, base_name = convert_to_wav(audio_path)
-
         print(f"🎧 Removing vocals for '{title}' by '{artist}'")
         print(f"📂 Output folder: {song_dir}")
 
+        final_instrumental = song_dir / "instrumental.wav"
+        final_vocals = song_dir / "vocals.wav"
+
+        # Preferred: the resident Demucs worker decodes the download through an
+        # ffmpeg pipe and writes the final stems directly (no temp WAV, no moves)
+        try:
+            SeparationWorker.instance().separate(audio_path, final_instrumental, final_vocals)
+            print(f"✅ Saved instrumental: {final_instrumental}")
+            print(f"✅ Saved vocals: {final_vocals}")
+            return str(final_instrumental), str(final_vocals)
+        except Exception as e:
+            print(f"⚠️ Demucs worker unavailable, falling back to subprocess: {e}")
+
+        # Fallback: convert input to WAV first for `python -m demucs`
+        safe_wav_path, base_name = convert_to_wav(audio_path)
+
         try:
             # Run Demucs
             subprocess.run(
@@ -49,9 +63,6 @@ class VocalRemover:
             vocals_path = model_folder / "vocals.wav"
 
             # Move to top-level of song_dir
-            final_instrumental = song_dir / "instrumental.wav"
-            final_vocals = song_dir / "vocals.wav"
-
             if instrumental_path.exists():
                 os.replace(instrumental_path, final_instrumental)
             if vocals_path.exists():
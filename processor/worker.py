@@ -1,101 +1,206 @@
-from PySide6.QtCore import QThread, Signal
+import os
+import threading
 from downloader.yt_downloader import YouTubeDownloader
+from searcher.youtube_search import lookup_info
 from processor.vocal_remover import VocalRemover
-from processor.lyrics_manager import LyricsManager
+from processor.lyrics_manager import LyricsManager, load_lrc
+from processor.audio_mixer import PreparedAudio
 from cache.cache_manager import CacheManager
 from utils.filename_safety import safe_name_long
 
 
-class ProcessWorker(QThread):
-    finished = Signal(dict)
-    error = Signal(str)
-    status = Signal(str)
+class PreparationCancelled(Exception):
+    pass
+
+
+def song_key(song: dict) -> str:
+    """Identify a queued song; web-remote picks from the library have no URL."""
+    return song.get("url") or f"{song.get('artist', '')}_{song.get('title', '')}"
 
-    def __init__(self, selected, cache: CacheManager, program_data_folder):
-        super().__init__()
-        self.selected = selected
-        self.cache = cache
-        self.program_data_folder = program_data_folder
 
-    def _download_video(self, video_url, song_dir):
-        """Download video to the same folder as the audio, if not already present."""
-        from yt_dlp import YoutubeDL
-        import os
+class SongJob:
+    """
+    One song moving through the preparation stages. Each stage method does
+    one step and stores its output on the job, so stages can run on
+    different threads (see PrepareScheduler).
 
-        video_path = os.path.join(song_dir, "video.mp4")
+    The audio chain (download -> separate -> transcribe) and the video
+    download are independent branches; the job is complete when both are.
+    """
+    BRANCHES = 2
+
+    def __init__(self, selected, cache: CacheManager, priority=0, on_status=None):
+        self.selected = selected
+        self.cache = cache
+        self.priority = priority   # lower runs first (queue position)
+        self.on_status = on_status or (lambda msg: None)
+        self.key = song_key(selected)
+
+        self.title = safe_name_long(selected["title"])
+        self.artist = safe_name_long(selected["artist"])
+        self.url = selected["url"]
+        self.song_dir = cache.get_song_dir(self.title, self.artist, self.url)
+
+        self.audio_path = None
+        self.instrumental_path = None
+        self.vocals_path = None
+        self.segments = None
+        self.lrc_path = None
+        self.video_path = None
+        self.cached_result = None
+        self.errors = []
+        self._cancelled = False
+        self._cancel_seen = False   # a stage has acted on the cancel; no way back
+        self._branches_left = self.BRANCHES
+        self._branch_lock = threading.Lock()
+
+    def cancel(self):
+        """Stop at the next stage boundary (a running stage finishes first)."""
+        self._cancelled = True
+
+    def uncancel(self) -> bool:
+        """Undo cancel() if no stage has acted on it yet; False if too late."""
+        with self._branch_lock:
+            if self._cancel_seen:
+                return False
+            self._cancelled = False
+            return True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def confirm_cancelled(self) -> bool:
+        """Like is_cancelled(), but once True the job can't be un-cancelled."""
+        with self._branch_lock:
+            if self._cancelled:
+                self._cancel_seen = True
+            return self._cancelled
+
+    def check_cancelled(self):
+        if self.confirm_cancelled():
+            raise PreparationCancelled()
+
+    def branch_done(self, error=None) -> bool:
+        """Mark one branch finished; True for whichever branch finishes last."""
+        with self._branch_lock:
+            if error:
+                self.errors.append(error)
+            self._branches_left -= 1
+            return self._branches_left == 0
+
+    # -------------------------
+    # Stages
+    # -------------------------
+    def load_cached(self):
+        """Return the finished result if the song is already processed, else None."""
+        cached = self.cache.check_existing(self.title, self.artist, self.url)
+        if not cached:
+            return None
+        cached["url"] = self.url
+        # Processed but never recorded (e.g. an earlier attempt failed late)
+        if not (self.song_dir / "meta.json").exists():
+            self.cache.save_meta(self.title, self.artist, self.url)
+        # If a downloaded video is present in the song folder, include it
+        video_path = self.song_dir / "video.mp4"
+        cached["video"] = str(video_path) if video_path.exists() else None
+
+        # Upgrade older cache entries to the memory-mapped stem store
+        self.cache.ensure_stem_store(self.song_dir)
+
+        self.on_status("Loaded from cache")
+        self.cached_result = self._warm_up(cached)
+        return self.cached_result
+
+    def download_audio(self):
+        self.song_dir.mkdir(parents=True, exist_ok=True)
+        self.on_status("Downloading audio...")
+        downloader = YouTubeDownloader()
+        # Reuse the searcher's extraction when this song came from a search
+        self.audio_path = downloader.download_audio(self.song_dir, self.url, info=lookup_info(self.url))
+        if not self.audio_path:
+            raise RuntimeError("Failed to download audio")
+
+    def separate(self):
+        self.on_status("Removing vocals...")
+        remover = VocalRemover()
+        self.instrumental_path, self.vocals_path = remover.remove_vocals(
+            self.audio_path, self.song_dir, self.title, self.artist
+        )
+        if not self.instrumental_path:
+            raise RuntimeError("Vocal removal failed")
+        self.cache.ensure_stem_store(self.song_dir)
+
+    def transcribe(self):
+        self.on_status("Transcribing lyrics...")
+        lm = LyricsManager()
+        self.segments, self.lrc_path = lm.transcribe(self.vocals_path, self.song_dir, self.title, self.artist)
+
+    def download_video(self):
+        """Download video to the same folder as the audio, if not already present.
+
+        Runs alongside the audio branch. A failure here only costs the video:
+        the song still plays (and is cached) without it.
+        """
+        if not self.url:
+            return
+        video_path = os.path.join(self.song_dir, "video.mp4")
 
         if os.path.exists(video_path):
-            self.status.emit("Video already exists, skipping download")
-            return video_path
-
-        self.status.emit("Downloading video...")
-        ydl_opts = {
-            "format": "bestvideo[ext=mp4]+bestaudio[ext=m4a]/mp4",
-            "outtmpl": video_path,
-            "quiet": True,
-        }
-        with YoutubeDL(ydl_opts) as ydl:
-            ydl.download([video_url])
-        self.status.emit("Video downloaded")
-        return video_path
+            self.on_status("Video already exists, skipping download")
+            self.video_path = video_path
+            return
 
-    def run(self):
+        self.on_status("Downloading video...")
         try:
-            title = safe_name_long(self.selected["title"])
-            artist = safe_name_long(self.selected["artist"])
-            url = self.selected["url"]
-
-            cached = self.cache.check_existing(title, artist)
-            if cached:
-                cached["url"] = url
-                # If a downloaded video is present in the song folder, include it
-                song_dir = self.cache.get_song_dir(title, artist)
-                video_path = song_dir / "video.mp4"
-                if video_path.exists():
-                    cached["video"] = str(video_path)
-                else:
-                    cached["video"] = None
-
-                self.status.emit("Loaded from cache")
-                self.finished.emit(cached)
-                return
-            
-            song_dir = self.cache.get_song_dir(title, artist)
-            song_dir.mkdir(parents=True, exist_ok=True)
-
-            self.status.emit("Downloading audio...")
-            downloader = YouTubeDownloader()
-            audio_path = downloader.download_audio(song_dir, url)
-            if not audio_path:
-                raise RuntimeError("Failed to download audio")
-
-            self.status.emit("Removing vocals...")
-            remover = VocalRemover()
-            instrumental_path, vocals_path = remover.remove_vocals(
-                audio_path, song_dir, title, artist
-            )
-
-            self.status.emit("Transcribing lyrics...")
-            lm = LyricsManager()
-            segments, lrc_path = lm.transcribe(vocals_path, song_dir, title, artist)
-
-            # --- Download video if URL provided ---
-            self.status.emit("Downloading video...")
-            video_path = None
-            if url:
-                video_path = self._download_video(url, song_dir)
-
-            self.cache.save_meta(title, artist, url)
-
-            result = {
-                "instrumental": instrumental_path,
-                "vocals": vocals_path,
-                "lyrics": lrc_path,
-                "segments": segments,
-                "url": url,
-                "video": video_path,
-            }
-            self.finished.emit(result)
+            self.song_dir.mkdir(parents=True, exist_ok=True)
+            from yt_dlp import YoutubeDL
 
+            ydl_opts = {
+                "format": "bestvideo[ext=mp4]+bestaudio[ext=m4a]/mp4",
+                "outtmpl": video_path,
+                "quiet": True,
+            }
+            with YoutubeDL(ydl_opts) as ydl:
+                ydl.download([self.url])
+        except Exception as e:
+            print(f"⚠️ Video download failed for {self.title}: {e}")
+            self.video_path = None
+            return
+        self.on_status("Video downloaded")
+        self.video_path = video_path
+
+    def result(self):
+        """Final result once both branches are done (see PrepareScheduler)."""
+        if self.cached_result is None:
+            return self.finish()
+        # The video branch may have finished after the cache was loaded
+        self.cached_result["video"] = self.video_path or self.cached_result["video"]
+        return self.cached_result
+
+    def finish(self):
+        """Record the song in the cache and build the result dict."""
+        self.cache.save_meta(self.title, self.artist, self.url)
+        result = {
+            "instrumental": self.instrumental_path,
+            "vocals": self.vocals_path,
+            "lyrics": self.lrc_path,
+            "segments": self.segments,
+            "url": self.url,
+            "video": self.video_path,
+        }
+        return self._warm_up(result)
+
+    def _warm_up(self, result):
+        """Parse lyrics and open/prefetch the stems so the player can swap them in instantly."""
+        if not result.get("segments") and result.get("lyrics"):
+            try:
+                result["segments"] = load_lrc(result["lyrics"])
+            except Exception as e:
+                print(f"⚠️ Failed to parse lyrics: {e}")
+        try:
+            result["audio"] = PreparedAudio(result.get("instrumental"), result.get("vocals"))
         except Exception as e:
-            self.error.emit(str(e))
\ No newline at end of file
+            print(f"⚠️ Failed to warm up audio: {e}")
+            result["audio"] = None
+        result["key"] = self.key
+        return result
@@ -0,0 +1,232 @@
+# mic_stream.py
+"""
+Binary mic frames from the web remote.
+
+A frame is one Socket.IO binary message:
+
+    uint32 seq | uint16 sample_rate | uint16 reserved | int16 PCM (mono, little endian)
+
+so there is no base64 or data-URL overhead, and the sequence number lets the
+server drop late/duplicate frames and count lost ones.
+
+Each phone gets its own JitterBuffer; MicMixer sums all of them into the
+output callback.
+"""
+import struct
+import threading
+import numpy as np
+
+MIC_SAMPLE_RATE = 44100
+FRAME_HEADER = struct.Struct("<IHH")
+_INT16_SCALE = np.float32(1.0 / 32768.0)
+# A sequence number this far behind the last one (or back at 0) means the
+# phone restarted its stream (mic toggled) rather than a late frame
+_RESTART_GAP = 64
+
+
+class MicClient:
+    """Per-phone decode state: sequence tracking plus a reused float32 buffer."""
+
+    def __init__(self, max_samples=4096):
+        self.last_seq = None
+        self.frames = 0
+        self.lost = 0
+        self.late = 0
+        self.malformed = 0
+        self.restarts = 0
+        self._buf = np.zeros(max_samples, dtype=np.float32)
+        # Resampling plan for the last (frame length, rate) plus scratch
+        # buffers, reused while phones keep sending same-sized frames
+        self._plan_key = None
+        self._lo = self._hi = self._frac = None
+        self._src = np.zeros(max_samples, dtype=np.float32)
+        self._tmp = np.zeros(max_samples, dtype=np.float32)
+
+    def decode(self, payload):
+        """
+        Decode one frame to float32 samples at MIC_SAMPLE_RATE, or None if it
+        should be dropped. The returned array is a view of an internal buffer
+        that is overwritten by the next call.
+        """
+        if not isinstance(payload, (bytes, bytearray, memoryview)) or len(payload) < FRAME_HEADER.size:
+            self.malformed += 1
+            return None
+        seq, rate, _ = FRAME_HEADER.unpack_from(payload)
+        n = (len(payload) - FRAME_HEADER.size) // 2
+        if n == 0:
+            return None  # header only, nothing to play
+
+        if self.last_seq is not None:
+            gap = (seq - self.last_seq) & 0xFFFFFFFF
+            behind = (self.last_seq - seq) & 0xFFFFFFFF
+            if gap >= 0x80000000 and (seq == 0 or behind > _RESTART_GAP):
+                self.restarts += 1  # new stream on the same socket
+            elif gap == 0 or gap >= 0x80000000:
+                self.late += 1  # duplicate or arrived after a newer frame
+                return None
+            else:
+                self.lost += gap - 1
+        self.last_seq = seq
+        self.frames += 1
+
+        pcm = np.frombuffer(payload, dtype="<i2", count=n, offset=FRAME_HEADER.size)
+        if rate and rate != MIC_SAMPLE_RATE:
+            return self._resample(pcm, rate)
+
+        out = self._buffer("_buf", n)
+        np.multiply(pcm, _INT16_SCALE, out=out, casting="unsafe")
+        return out
+
+    def _buffer(self, name, n):
+        """First n samples of a reused scratch buffer, grown if needed."""
+        buf = getattr(self, name)
+        if len(buf) < n:
+            buf = np.zeros(n, dtype=np.float32)
+            setattr(self, name, buf)
+        return buf[:n]
+
+    def _resample(self, pcm, rate):
+        """
+        Linear resample to MIC_SAMPLE_RATE (phones usually capture at 48 kHz;
+        plenty for voice) using only reused buffers.
+        """
+        n = len(pcm)
+        if self._plan_key != (n, rate):
+            out_n = max(1, int(round(n * MIC_SAMPLE_RATE / rate)))
+            pos = np.linspace(0, n - 1, out_n)
+            self._lo = np.floor(pos).astype(np.intp)
+            self._hi = np.minimum(self._lo + 1, n - 1)
+            self._frac = (pos - self._lo).astype(np.float32)
+            self._plan_key = (n, rate)
+
+        src = self._buffer("_src", n)
+        np.multiply(pcm, _INT16_SCALE, out=src, casting="unsafe")
+        out_n = len(self._lo)
+        out = self._buffer("_buf", out_n)
+        tmp = self._buffer("_tmp", out_n)
+        np.take(src, self._lo, out=out)
+        np.take(src, self._hi, out=tmp)
+        tmp -= out
+        tmp *= self._frac
+        out += tmp
+        return out
+
+    def stats(self):
+        return {"frames": self.frames, "lost": self.lost, "late": self.late,
+                "malformed": self.malformed, "restarts": self.restarts}
+
+
+class JitterBuffer:
+    """
+    Fixed-size float32 ring buffer for one singer.
+
+    Playback starts once `target` seconds are buffered, so block sizes that
+    don't match the device block never cause gaps. If the fill creeps past
+    `max_latency` (phone sent a burst) the oldest audio is dropped back down to
+    the target, and a full ring drops oldest too, so latency stays bounded.
+    """
+
+    def __init__(self, target=0.06, max_latency=0.2, capacity=0.5, samplerate=MIC_SAMPLE_RATE):
+        self.target = int(target * samplerate)
+        self.max_fill = int(max_latency * samplerate)
+        self._ring = np.zeros(int(capacity * samplerate), dtype=np.float32)
+        self._read = 0    # absolute sample counters; fill = write - read
+        self._write = 0
+        self._primed = False
+        self.underruns = 0
+        self.overruns = 0
+        self._lock = threading.Lock()
+
+    @property
+    def fill(self):
+        return self._write - self._read
+
+    def write(self, samples):
+        cap = len(self._ring)
+        if len(samples) > cap:
+            samples = samples[-cap:]
+        n = len(samples)
+        with self._lock:
+            if self.fill + n > cap:
+                self._read = self._write + n - cap  # drop oldest
+                self.overruns += 1
+            start = self._write % cap
+            first = min(n, cap - start)
+            self._ring[start:start + first] = samples[:first]
+            self._ring[:n - first] = samples[first:]
+            self._write += n
+            if self.fill > self.max_fill:
+                self._read = self._write - self.target
+                self.overruns += 1
+
+    def read_add(self, out) -> bool:
+        """Add the next len(out) samples into out. False while (re)buffering."""
+        n = len(out)
+        cap = len(self._ring)
+        with self._lock:
+            fill = self.fill
+            if not self._primed:
+                if fill < self.target:
+                    return False
+                self._primed = True
+            take = min(n, fill)
+            if take < n:
+                # Ran dry: play what's left, then rebuffer up to the target
+                self.underruns += 1
+                self._primed = False
+            start = self._read % cap
+            first = min(take, cap - start)
+            out[:first] += self._ring[start:start + first]
+            out[first:take] += self._ring[:take - first]
+            self._read += take
+            return True
+
+    def stats(self):
+        return {"fill_ms": round(1000 * self.fill / MIC_SAMPLE_RATE, 1),
+                "underruns": self.underruns, "overruns": self.overruns}
+
+
+class MicMixer:
+    """All connected singers: decode into per-client jitter buffers, sum on output."""
+
+    def __init__(self, target=0.06):
+        self.target = target
+        self._inputs = {}   # client id -> (MicClient, JitterBuffer)
+        self._lock = threading.Lock()
+
+    def _input(self, client_id):
+        with self._lock:
+            entry = self._inputs.get(client_id)
+            if entry is None:
+                entry = self._inputs[client_id] = (MicClient(), JitterBuffer(self.target))
+            return entry
+
+    def push_frame(self, client_id, payload):
+        """Binary mic frame (see module docstring)."""
+        client, jitter = self._input(client_id)
+        samples = client.decode(payload)
+        if samples is not None:
+            jitter.write(samples)
+
+    def push_samples(self, client_id, samples):
+        """Already-decoded float32 samples (legacy base64 path)."""
+        self._input(client_id)[1].write(samples)
+
+    def remove(self, client_id):
+        with self._lock:
+            self._inputs.pop(client_id, None)
+
+    def mix_into(self, out) -> int:
+        """Sum every singer into out (mono float32, pre-zeroed). Returns active singers."""
+        with self._lock:
+            buffers = [jitter for _, jitter in self._inputs.values()]
+        active = 0
+        for jitter in buffers:
+            if jitter.read_add(out):
+                active += 1
+        return active
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._inputs.items())
+        return {cid: {**client.stats(), **jitter.stats()} for cid, (client, jitter) in entries}
@@ -0,0 +1,101 @@
+# remote/queue_sync.py
+"""
+Versioned queue state for the web remote.
+
+Instead of pushing the whole queue on every change, RemoteServer sends
+"queue_patch" events: {"base": v, "v": v + 1, "ops": [...]} where ops are
+applied in order to the client's copy:
+
+    {"op": "insert", "index": i, "item": {...}}
+    {"op": "remove", "index": i}
+    {"op": "move", "from": i, "to": j}
+    {"op": "reset", "items": [...]}      (when a patch would be bigger)
+
+A client whose version isn't `base` missed something and refetches
+/api/getQueue ({"v": v, "items": [...]}).
+"""
+import threading
+
+# Only what the remote page shows, not the cached file paths etc.
+ITEM_FIELDS = ("title", "artist", "queued_by")
+
+
+def _song_key(song: dict) -> str:
+    # Same identity as processor.worker.song_key; not imported from there so
+    # the remote server process doesn't load the whole processing stack
+    return song.get("url") or f"{song.get('artist', '')}_{song.get('title', '')}"
+
+
+def slim_item(song: dict, item_id: str) -> dict:
+    item = {"id": item_id}
+    for field in ITEM_FIELDS:
+        if song.get(field) is not None:
+            item[field] = song[field]
+    return item
+
+
+class QueueSync:
+    def __init__(self):
+        self.version = 0
+        self.items = []     # slim items as last broadcast
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _slim(queue):
+        # Same song queued twice gets distinct ids: key#occurrence
+        seen = {}
+        items = []
+        for song in queue:
+            key = _song_key(song)
+            seen[key] = seen.get(key, 0) + 1
+            items.append(slim_item(song, f"{key}#{seen[key]}"))
+        return items
+
+    @staticmethod
+    def _diff(old, new):
+        """Ops turning `old` into `new` (lists of slim items), applied in order."""
+        ops = []
+        cur = list(old)
+        new_ids = {item["id"] for item in new}
+        for i in range(len(cur) - 1, -1, -1):
+            if cur[i]["id"] not in new_ids:
+                ops.append({"op": "remove", "index": i})
+                del cur[i]
+        for i, item in enumerate(new):
+            ids = [c["id"] for c in cur]
+            if i < len(cur) and ids[i] == item["id"]:
+                if cur[i] != item:  # same song, edited fields
+                    ops.append({"op": "remove", "index": i})
+                    ops.append({"op": "insert", "index": i, "item": item})
+                    cur[i] = item
+                continue
+            if item["id"] in ids:
+                j = ids.index(item["id"])
+                ops.append({"op": "move", "from": j, "to": i})
+                cur.insert(i, cur.pop(j))
+                if cur[i] != item:
+                    ops.append({"op": "remove", "index": i})
+                    ops.append({"op": "insert", "index": i, "item": item})
+                    cur[i] = item
+            else:
+                ops.append({"op": "insert", "index": i, "item": item})
+                cur.insert(i, item)
+        return ops
+
+    def update(self, queue):
+        """Record a new queue; returns the patch to broadcast, or None if unchanged."""
+        items = self._slim(queue)
+        with self._lock:
+            ops = self._diff(self.items, items)
+            if not ops:
+                return None
+            if len(ops) > max(len(items), 1):
+                ops = [{"op": "reset", "items": items}]
+            patch = {"base": self.version, "v": self.version + 1, "ops": ops}
+            self.version += 1
+            self.items = items
+            return patch
+
+    def snapshot(self):
+        with self._lock:
+            return {"v": self.version, "items": list(self.items)}
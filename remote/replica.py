@@ -0,0 +1,138 @@
+# remote/replica.py
+"""
+Child-process side of the out-of-process remote server.
+
+The web remote runs here against a ReplicaApp: a copy of the bits of
+KaraokeAppQt the routes read (queue, library, counts), kept current by state
+messages from the GUI. Anything that changes the app is sent back as a
+command, and mic audio is forwarded raw so it is decoded next to the audio
+callback. Nothing here imports Qt.
+"""
+import queue
+import threading
+from types import SimpleNamespace
+from searcher.library_index import LibraryIndex
+
+
+class _Hook:
+    """Stand-in for a Qt signal: connect() callbacks, emit() calls them."""
+
+    def __init__(self, on_emit=None):
+        self._callbacks = []
+        if on_emit:
+            self._callbacks.append(on_emit)
+
+    def connect(self, callback):
+        self._callbacks.append(callback)
+
+    def emit(self, *args):
+        for callback in self._callbacks:
+            callback(*args)
+
+
+class _ForwardingAudioMixer:
+    """Mic gain changes go to the real AudioMixer in the GUI process."""
+
+    def __init__(self, send):
+        self._send = send
+
+    def add_input(self, name, source, gain=1.0):
+        pass
+
+    def set_input_gain(self, name, gain):
+        self._send("set_input_gain", name, gain)
+
+
+class ForwardingMicSink:
+    """MicMixer interface that ships frames to the GUI process instead of mixing."""
+
+    def __init__(self, mic_queue):
+        self._queue = mic_queue
+        self.forwarded = 0
+        self.dropped = 0
+
+    def _put(self, msg):
+        try:
+            self._queue.put_nowait(msg)
+            self.forwarded += 1
+        except queue.Full:
+            self.dropped += 1  # GUI fell behind; stale audio is useless anyway
+
+    def push_frame(self, client_id, payload):
+        self._put(("frame", client_id, bytes(payload)))
+
+    def push_samples(self, client_id, samples):
+        self._put(("samples", client_id, samples))
+
+    def remove(self, client_id):
+        self._put(("remove", client_id, None))
+
+    def stats(self):
+        return {"forwarded": self.forwarded, "dropped": self.dropped}
+
+
+class ReplicaApp:
+    """What RemoteServer needs from KaraokeAppQt, mirrored in the server process."""
+
+    def __init__(self, commands):
+        self._commands = commands
+        self.queue = []
+        self.song_counts = {}
+        self.cached_songs = []
+        self.library_index = LibraryIndex()
+        self.current_selected = None
+        self.player_window = SimpleNamespace(current_title=None)
+        self.queue_changed = _Hook()
+        self.add_song_signal = _Hook(lambda *args: self._send("queue_song_from_url", *args))
+        self.audio_mixer = _ForwardingAudioMixer(self._send)
+
+    def _send(self, name, *args):
+        self._commands.put((name, args))
+
+    # Controls are executed by the GUI process
+    def play_song(self):
+        self._send("play_song")
+
+    def pause_song(self):
+        self._send("pause_song")
+
+    def toggle_vocal(self):
+        self._send("toggle_vocal")
+
+    def skip_song(self):
+        self._send("skip_song")
+
+    def queue_song(self):
+        self._send("queue_selected", self.current_selected)
+
+    def apply(self, kind, data):
+        """Update from a GUI state message."""
+        if kind == "state":
+            self.queue = data["queue"]
+            self.song_counts = data["song_counts"]
+            self.player_window.current_title = data["now_playing"]
+            self.queue_changed.emit(self.queue)
+        elif kind == "library":
+            self.library_index.sync(data)
+            self.cached_songs = data
+
+
+def serve(port, state, commands, mic):
+    """Child process entry point: run the remote server until the GUI goes away."""
+    from remote.server import RemoteServer
+
+    app = ReplicaApp(commands)
+    server = RemoteServer(app, mic_sink=ForwardingMicSink(mic))
+
+    def _follow_state():
+        while True:
+            msg = state.get()
+            if msg is None:
+                break
+            try:
+                app.apply(*msg)
+            except Exception as e:
+                print(f"⚠️ Remote replica update failed: {e}")
+
+    threading.Thread(target=_follow_state, daemon=True).start()
+    server.run(port=port)
@@ -1,27 +1,35 @@
 from flask import Flask, request, jsonify
 from flask_socketio import SocketIO
 import numpy as np
-import sounddevice as sd
 import base64
 import threading
-from queue import Queue
+from remote.mic_stream import MicMixer
+from remote.queue_sync import QueueSync
 
 class RemoteServer:
-    def __init__(self, app_ref):
+    MIC_GAIN = 1.0
+    def __init__(self, app_ref, mic_sink=None):
+        """
+        app_ref: KaraokeAppQt, or a ReplicaApp when running in its own
+        process (see remote/server_process.py). mic_sink: where mic audio goes;
+        defaults to a MicMixer feeding the app's AudioMixer.
+        """
         self.app_ref = app_ref  # reference to KaraokeAppQt
         self.app = Flask(__name__)
         self.socketio = SocketIO(self.app, cors_allowed_origins="*", async_mode="eventlet")
 
         # After updating the queue in the app (example in add_to_queue)
+        # Clients get versioned patches, not the whole queue (see queue_sync)
+        self.queue_sync = QueueSync()
+        self.queue_sync.update(self.app_ref.queue)
         self.app_ref.queue_changed.connect(self.broadcast_queue)
 
-        # Queue for incoming audio chunks
-        self.audio_queue = Queue()
-
-        # Sounddevice stream (continuous playback)
-        self.stream = sd.OutputStream(samplerate=44100, channels=1, dtype='float32',
-                                      callback=self._audio_callback)
-        self.stream.start()
+        # One jitter buffer per singer (Socket.IO session id), summed straight
+        # into the app's AudioMixer callback: one device stream, one clock
+        if mic_sink is None:
+            mic_sink = MicMixer()
+            self.app_ref.audio_mixer.add_input("mic", mic_sink, gain=self.MIC_GAIN)
+        self.mic_mixer = mic_sink
 
         # --- REST API endpoints ---
         @self.app.route("/api/play", methods=["POST"])
@@ -75,15 +83,20 @@ class RemoteServer:
 
         @self.app.route("/api/getQueue", methods=["GET"])
         def get_queue():
-            return jsonify(self.app_ref.queue)
+            # Full versioned snapshot; clients resync with this after a missed patch
+            return jsonify(self.queue_sync.snapshot())
 
         @self.app.route("/api/getSongs", methods=["GET"])
         def get_songs():
-            query = request.args.get("q", "").lower()
+            query = request.args.get("q", "").strip()
             song_counts = self.app_ref.song_counts  # { title: count }
 
-            # Start from cached songs (or all available songs)
-            all_songs = self.app_ref.cached_songs  # list of dicts with "title", "artist"
+            # Start from cached songs, narrowed by the library search index
+            if query:
+                index = self.app_ref.library_index
+                all_songs = [index.songs[i] for i in index.search(query) if i in index.songs]
+            else:
+                all_songs = self.app_ref.cached_songs  # list of dicts with "title", "artist"
 
             # Merge counts
             merged = []
@@ -91,13 +104,9 @@ class RemoteServer:
                 title = s.get("title", "")
                 artist = s.get("artist", "")
                 count = song_counts.get(title, 0)
-                merged.append({"title": title, "artist": artist, "queued": count})
-
-            # Filter if query provided
-            if query:
-                merged = [s for s in merged if query in s["title"].lower() or query in s["artist"].lower()]
+                merged.append({"title": title, "artist": artist, "url": s.get("url") or "", "queued": count})
 
-            # Sort descending by queued count
+            # Sort descending by queued count (stable, so search relevance breaks ties)
             merged.sort(key=lambda x: x["queued"], reverse=True)
 
             return jsonify(merged)
@@ -109,38 +118,50 @@ class RemoteServer:
 
         @self.socketio.on("audio_chunk")
         def handle_audio(data):
+            # Legacy base64 data-URL chunks; new clients send "mic_frame"
             audio_bytes = base64.b64decode(data.split(",")[1])
             audio_array = np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32) / 32768.0
-            self.audio_queue.put(audio_array)
+            self.mic_mixer.push_samples(request.sid, audio_array)
+
+        @self.socketio.on("mic_frame")
+        def handle_mic_frame(payload):
+            self.mic_mixer.push_frame(request.sid, payload)
+
+        @self.app.route("/api/micStats", methods=["GET"])
+        def mic_stats():
+            return jsonify(self.mic_mixer.stats())
+
+        @self.app.route("/api/micGain", methods=["POST"])
+        def mic_gain():
+            gain = float((request.json or {}).get("gain", self.MIC_GAIN))
+            self.app_ref.audio_mixer.set_input_gain("mic", gain)
+            return jsonify({"gain": gain})
 
         @self.socketio.on("connect")
         def on_connect():
-            self.socketio.emit("queue_update", self.app_ref.queue)
+            self.socketio.emit("queue_snapshot", self.queue_sync.snapshot(), to=request.sid)
+
+        @self.socketio.on("disconnect")
+        def on_disconnect():
+            self.mic_mixer.remove(request.sid)
 
     def broadcast_queue(self, queue):
-        # print("Broadcasting queue:", queue)
-        # Emit to all clients
-        self.socketio.emit("queue_update", queue, namespace="/")
-
-
-    def _audio_callback(self, outdata, frames, time, status):
-        if status:
-            print("Audio status:", status)
-        try:
-            chunk = self.audio_queue.get_nowait()
-            if len(chunk) < len(outdata):
-                outdata[:len(chunk), 0] = chunk
-                outdata[len(chunk):, 0] = 0
-            else:
-                outdata[:, 0] = chunk[:len(outdata)]
-        except:
-            outdata.fill(0)
+        # Emit only what changed to all clients; no-op updates send nothing
+        patch = self.queue_sync.update(queue)
+        if patch:
+            self.socketio.emit("queue_patch", patch, namespace="/")
+
+
+    def library_changed(self):
+        """Routes read the app directly in this mode; nothing to sync."""
+        pass
+
+    def run(self, host="0.0.0.0", port=5005):
+        """Serve until the process exits (blocking)."""
+        self.socketio.run(self.app, host=host, port=port)
 
     def start(self):
         """
         Start Flask + Socket.IO server in a background thread.
         """
-        threading.Thread(
-            target=lambda: self.socketio.run(self.app, host="0.0.0.0", port=5005),
-            daemon=True
-        ).start()
+        threading.Thread(target=self.run, daemon=True).start()
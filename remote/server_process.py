@@ -0,0 +1,94 @@
+# remote/server_process.py
+"""
+GUI side of the out-of-process remote server (KARAOKE_REMOTE_MODE=process).
+
+Flask/Socket.IO and all of their request handling run in a spawned child
+(see remote/replica.py), so a room full of phones can't starve the Qt event
+loop or the audio callback. The child gets state snapshots over one queue
+and sends commands back over another; mic frames have their own bounded
+queue and are decoded here into the MicMixer the AudioMixer reads from.
+"""
+import multiprocessing as mp
+import threading
+from PySide6.QtCore import QObject, Signal
+from remote.mic_stream import MicMixer
+from remote.replica import serve
+from remote.server import RemoteServer
+
+
+class RemoteServerProcess(QObject):
+    _command = Signal(str, tuple)   # child -> GUI thread
+
+    def __init__(self, app_ref, port=5005):
+        super().__init__()
+        self.app_ref = app_ref
+        self.port = port
+        ctx = mp.get_context("spawn")
+        self._state = ctx.Queue()
+        self._commands = ctx.Queue()
+        self._mic = ctx.Queue(maxsize=256)
+        self._process = ctx.Process(
+            target=serve, args=(port, self._state, self._commands, self._mic), daemon=True
+        )
+
+        self.mic_mixer = MicMixer()
+        app_ref.audio_mixer.add_input("mic", self.mic_mixer, gain=RemoteServer.MIC_GAIN)
+
+        self._command.connect(self._dispatch)
+        app_ref.queue_changed.connect(lambda _: self.push_state())
+
+    def start(self):
+        self._process.start()
+        threading.Thread(target=self._command_loop, daemon=True).start()
+        threading.Thread(target=self._mic_loop, daemon=True).start()
+        self.library_changed()
+        self.push_state()
+
+    def stop(self):
+        self._state.put(None)
+        self._process.terminate()
+
+    # -------------------------
+    # GUI -> server
+    # -------------------------
+    def push_state(self):
+        now_playing = getattr(self.app_ref.player_window, "current_title", None)
+        self._state.put(("state", {
+            "queue": self.app_ref.queue,
+            "song_counts": self.app_ref.song_counts,
+            "now_playing": now_playing,
+        }))
+
+    def library_changed(self):
+        self._state.put(("library", self.app_ref.cached_songs))
+
+    # -------------------------
+    # Server -> GUI
+    # -------------------------
+    def _command_loop(self):
+        while True:
+            name, args = self._commands.get()
+            self._command.emit(name, args)  # queued onto the GUI thread
+
+    def _dispatch(self, name, args):
+        app = self.app_ref
+        try:
+            if name == "queue_selected":
+                app.current_selected = args[0]
+                app.queue_song()
+            elif name == "set_input_gain":
+                app.audio_mixer.set_input_gain(*args)
+            else:
+                getattr(app, name)(*args)
+        except Exception as e:
+            print(f"⚠️ Remote command {name} failed: {e}")
+
+    def _mic_loop(self):
+        while True:
+            kind, client_id, data = self._mic.get()
+            if kind == "frame":
+                self.mic_mixer.push_frame(client_id, data)
+            elif kind == "samples":
+                self.mic_mixer.push_samples(client_id, data)
+            else:
+                self.mic_mixer.remove(client_id)
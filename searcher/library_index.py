@@ -0,0 +1,291 @@
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+_WORD_RE = re.compile(r"\w+")
+# Hiragana/katakana, CJK ideographs, hangul: no spaces between words
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+
+# Cap on lyrics-only tokens a single prefix may expand to (title/artist
+# tokens are never capped, so short prefixes still list every matching song)
+_MAX_PREFIX_EXPANSION = 200
+# Query tokens this short match so many songs that their results are cached
+# until the index changes (one-letter ones are precomputed after each sync)
+_SHORT_TOKEN = 2
+_MAX_SHORT_CACHE = 512
+# Fraction of query trigrams a title/artist must share to count as a typo match
+_FUZZY_THRESHOLD = 0.5
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text or "").casefold()
+
+
+def _cjk_tokens(run):
+    return list(run) + [run[i] + run[i + 1] for i in range(len(run) - 1)]
+
+
+def tokenize(text: str) -> list:
+    """
+    Words for spaced scripts; single characters plus bigrams for CJK. CJK
+    bigrams bridge punctuation and spaces ("눈,코,입" -> 눈코, 코입) but not
+    letters or digits of other scripts.
+    """
+    text = normalize(text)
+    tokens = [part for word in _WORD_RE.findall(text) for part in _CJK_RE.split(word) if part]
+    run = []
+    for ch in text:
+        if _CJK_RE.match(ch):
+            run.append(ch)
+        elif ch.isalnum() or ch == "_":
+            tokens.extend(_cjk_tokens(run))
+            run = []
+    tokens.extend(_cjk_tokens(run))
+    return tokens
+
+
+def trigrams(text: str) -> set:
+    padded = f" {' '.join(_WORD_RE.findall(normalize(text)))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _rank(scores: dict) -> list:
+    """Ids by score, best first; ties by id (stable sort, no per-item key tuples)."""
+    ranked = sorted(scores)
+    ranked.sort(key=scores.__getitem__, reverse=True)
+    return ranked
+
+
+class LibraryIndex:
+    """
+    In-memory search index over the song library (title, artist, lyrics).
+
+    Title/artist get both a token index (prefix matches) and a trigram index
+    (typo tolerance); lyrics only get the token index to keep memory small.
+    Safe to query from the remote server thread while the GUI updates it.
+    sync_async() builds off the calling thread; until it finishes, search()
+    falls back to a plain title/artist substring scan.
+    """
+
+    def __init__(self, songs=()):
+        self.songs = {}                         # song id -> entry, latest list given to sync
+        self._indexed = {}                      # song id -> entry as indexed
+        self._meta_tokens = defaultdict(set)    # token -> ids (title/artist)
+        self._lyric_tokens = defaultdict(set)   # token -> ids (lyrics)
+        self._grams = defaultdict(set)          # trigram -> ids (title/artist)
+        self._song_keys = {}                    # id -> (meta tokens, lyric tokens, grams)
+        self._sorted_tokens = []                # for prefix lookups; may hold removed tokens
+        self._new_tokens = []                   # merged into _sorted_tokens on next query
+        self._short_hits = {}                   # short query token -> (hits, ranked ids)
+        self._lock = threading.RLock()
+        self._syncing = False
+        self._pending = None                    # (songs, on_done) for the sync thread
+        self._pending_lock = threading.Lock()
+        if songs:
+            self.sync(songs)
+
+    # -------------------------
+    # Updates
+    # -------------------------
+    def add(self, song: dict):
+        """Index (or re-index) one library entry."""
+        with self._lock:
+            if song["id"] in self._indexed:
+                self.remove(song["id"])
+            self._short_hits.clear()
+            song_id = song["id"]
+            meta_text = f"{song.get('title', '')} {song.get('artist', '')}"
+            meta_tokens = set(tokenize(meta_text))
+            lyric_tokens = set(tokenize(song.get("lyrics", ""))) - meta_tokens
+            grams = trigrams(meta_text)
+
+            for t in meta_tokens:
+                self._add_token(self._meta_tokens, t, song_id)
+            for t in lyric_tokens:
+                self._add_token(self._lyric_tokens, t, song_id)
+            for g in grams:
+                self._grams[g].add(song_id)
+            self._indexed[song_id] = song
+            self._song_keys[song_id] = (meta_tokens, lyric_tokens, grams)
+
+    def _add_token(self, table, token, song_id):
+        if token not in self._meta_tokens and token not in self._lyric_tokens:
+            self._new_tokens.append(token)
+        table[token].add(song_id)
+
+    def remove(self, song_id: str):
+        with self._lock:
+            keys = self._song_keys.pop(song_id, None)
+            self._indexed.pop(song_id, None)
+            if keys is None:
+                return
+            self._short_hits.clear()
+            meta_tokens, lyric_tokens, grams = keys
+            for table, tokens in ((self._meta_tokens, meta_tokens), (self._lyric_tokens, lyric_tokens)):
+                for t in tokens:
+                    table[t].discard(song_id)
+                    if not table[t]:
+                        del table[t]
+            for g in grams:
+                self._grams[g].discard(song_id)
+                if not self._grams[g]:
+                    del self._grams[g]
+
+    def sync(self, songs):
+        """Bring the index in line with a full song list, touching only what changed."""
+        self.songs = {song["id"]: song for song in songs}
+        self._sync(songs)
+
+    def sync_async(self, songs, on_done=None):
+        """
+        Like sync(), on a background thread (a big library takes seconds to
+        index). on_done is called from that thread once the index is current.
+        """
+        self.songs = {song["id"]: song for song in songs}
+        with self._pending_lock:
+            self._pending = (songs, on_done)
+            if self._syncing:
+                return  # the running thread picks up the newest list next
+            self._syncing = True
+        threading.Thread(target=self._sync_loop, name="library-index", daemon=True).start()
+
+    def _sync_loop(self):
+        while True:
+            with self._pending_lock:
+                songs, on_done = self._pending
+                self._pending = None
+            self._sync(songs)
+            self._warm_short_hits()
+            with self._pending_lock:
+                if self._pending is not None:
+                    continue  # superseded; its own on_done reports
+                self._syncing = False
+            # Index is live before on_done, so a re-query from it uses the index
+            if on_done:
+                on_done()
+            return
+
+    def _sync(self, songs):
+        # Lock per song, so queries never wait for a whole rebuild
+        seen = set()
+        for song in songs:
+            seen.add(song["id"])
+            if self._indexed.get(song["id"]) != song:
+                self.add(song)
+        for song_id in list(self._indexed):
+            if song_id not in seen:
+                self.remove(song_id)
+
+    def _warm_short_hits(self):
+        """Precompute every one-letter title/artist prefix, so the first keystroke is instant."""
+        with self._lock:
+            letters = {t[0] for t in self._meta_tokens}
+        for letter in letters:
+            with self._lock:
+                self._hits(letter)
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def _expand(self, token):
+        """Indexed tokens starting with token (a one-letter query is a prefix too)."""
+        if self._new_tokens:
+            # Sorted tail + existing sorted run: timsort merges these in linear time
+            self._sorted_tokens.extend(sorted(set(self._new_tokens)))
+            self._sorted_tokens.sort()
+            self._new_tokens = []
+        i = bisect_left(self._sorted_tokens, token)
+        matches = []
+        lyric_only = 0
+        # A single letter would match most lyrics; for those only title/artist
+        # prefixes (plus an exact lyric token, e.g. one CJK character) count
+        lyric_cap = _MAX_PREFIX_EXPANSION if len(token) > 1 else 0
+        if lyric_cap == 0 and token in self._lyric_tokens and token not in self._meta_tokens:
+            matches.append(token)
+        while i < len(self._sorted_tokens):
+            t = self._sorted_tokens[i]
+            if not t.startswith(token):
+                break
+            if t in self._meta_tokens:
+                matches.append(t)
+            elif t in self._lyric_tokens and lyric_only < lyric_cap:
+                matches.append(t)
+                lyric_only += 1
+            i += 1
+        return matches
+
+    def search(self, query: str, limit=None) -> list:
+        """
+        Song ids matching query, best first. A song matches when every query
+        token is a (prefix of a) title/artist/lyrics token, or when its
+        title/artist shares enough trigrams with the query to be a typo.
+        """
+        if self._syncing:
+            return self._scan(query, limit)
+        q_tokens = list(dict.fromkeys(tokenize(query)))
+        if not q_tokens:
+            return []
+        q_grams = trigrams(query)
+        with self._lock:
+            if len(q_tokens) == 1 and len(q_grams) < 3 and len(q_tokens[0]) <= _SHORT_TOKEN:
+                ranked = self._hits(q_tokens[0])[1]  # no typo matching this short
+                return ranked[:limit] if limit else list(ranked)
+
+            # Every token must match: walk the smallest hit set, look up the rest
+            per_token = sorted((self._hits(qt)[0] for qt in q_tokens), key=len)
+            results = {}
+            for song_id, score in per_token[0].items():
+                for hits in per_token[1:]:
+                    other = hits.get(song_id)
+                    if other is None:
+                        break
+                    score += other
+                else:
+                    results[song_id] = score
+
+            if len(q_grams) >= 3:
+                counts = defaultdict(int)
+                for g in q_grams:
+                    for song_id in self._grams.get(g, ()):
+                        counts[song_id] += 1
+                for song_id, n in counts.items():
+                    similarity = n / len(q_grams)
+                    if similarity >= _FUZZY_THRESHOLD:
+                        results[song_id] = results.get(song_id, 0.0) + 3 * similarity
+
+            ranked = _rank(results)
+            return ranked[:limit] if limit else ranked
+
+    def _hits(self, qt):
+        """(song id -> score, ids best first) for one query token; called with the lock held."""
+        cached = self._short_hits.get(qt)
+        if cached is not None:
+            return cached
+        hits = {}
+        for t in self._expand(qt):
+            weight = 2.0 if t == qt else 1.0
+            for score, table in ((weight * 2, self._meta_tokens), (weight * 0.5, self._lyric_tokens)):
+                if table is self._lyric_tokens and len(qt) == 1 and t != qt:
+                    continue  # one-letter prefixes: title/artist only (see _expand)
+                for song_id in table.get(t, ()):
+                    if hits.get(song_id, 0.0) < score:
+                        hits[song_id] = score
+        entry = (hits, None)
+        if len(qt) <= _SHORT_TOKEN:
+            entry = (hits, _rank(hits))
+            if len(self._short_hits) >= _MAX_SHORT_CACHE:
+                # Keep the precomputed one-letter entries
+                self._short_hits = {t: e for t, e in self._short_hits.items() if len(t) == 1}
+            self._short_hits[qt] = entry
+        return entry
+
+    def _scan(self, query: str, limit=None) -> list:
+        """Substring match on title/artist, used while the index is being built."""
+        q = normalize(query).strip()
+        if not q:
+            return []
+        ids = [song_id for song_id, song in list(self.songs.items())
+               if q in normalize(song.get("title", "")) or q in normalize(song.get("artist", ""))]
+        return ids[:limit] if limit else ids
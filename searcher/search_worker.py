@@ -0,0 +1,39 @@
+from PySide6.QtCore import QThread, Signal
+from searcher.youtube_search import YouTubeSearcher
+
+
+class SearchWorker(QThread):
+    """Runs one YouTube search off the GUI thread, streaming results as they arrive."""
+    result = Signal(int, dict)   # original result index, result
+    done = Signal(list)
+    error = Signal(str)
+
+    def __init__(self, searcher: YouTubeSearcher, query: str, max_results=10):
+        super().__init__()
+        self.searcher = searcher
+        self.query = query
+        self.max_results = max_results
+        self._cancelled = False
+
+    def cancel(self):
+        """Stale search: stop emitting and return as soon as possible."""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def _on_result(self, index, result):
+        if not self._cancelled:
+            self.result.emit(index, result)
+
+    def run(self):
+        try:
+            results = self.searcher.search(
+                self.query, max_results=self.max_results,
+                on_result=self._on_result, is_cancelled=self.is_cancelled,
+            )
+            if not self._cancelled:
+                self.done.emit(results)
+        except Exception as e:
+            if not self._cancelled:
+                self.error.emit(str(e))
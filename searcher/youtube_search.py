@@ -1,17 +1,99 @@
 # searcher/youtube_search.py
 from yt_dlp import YoutubeDL
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
+import time
+from utils.youtube_ids import extract_video_id
+
+# Full extract_info() results from searches, so the downloader can reuse them
+# instead of extracting the same video again. Stream URLs in them expire, so
+# entries are only handed out while fresh.
+_INFO_TTL = 30 * 60
+_INFO_MAX = 50
+_info_cache = OrderedDict()   # videoId -> (timestamp, info)
+_info_lock = threading.Lock()
+
+
+def remember_info(info: dict):
+    video_id = info.get("id")
+    if not video_id or not info.get("formats"):
+        return
+    with _info_lock:
+        _info_cache[video_id] = (time.time(), info)
+        _info_cache.move_to_end(video_id)
+        while len(_info_cache) > _INFO_MAX:
+            _info_cache.popitem(last=False)
+
+
+def lookup_info(url: str):
+    """Return a fresh full info dict for this video URL, or None."""
+    video_id = extract_video_id(url)
+    with _info_lock:
+        entry = _info_cache.get(video_id)
+    if entry and time.time() - entry[0] < _INFO_TTL:
+        return entry[1]
+    return None
+
+# Shared by every search: bounded, and each thread keeps its own YoutubeDL
+_METADATA_WORKERS = 4
+_executor = ThreadPoolExecutor(max_workers=_METADATA_WORKERS, thread_name_prefix="yt-metadata")
+_thread_local = threading.local()
+
+
+def _thread_ydl():
+    ydl = getattr(_thread_local, "ydl", None)
+    if ydl is None:
+        ydl = _thread_local.ydl = YoutubeDL({'quiet': True})
+    return ydl
+
+
+def _make_result(entry, artist, duration):
+    return {
+        'title': entry.get('title'),
+        'videoId': entry.get('id'),
+        'artist': artist or "",
+        'duration': duration,
+        'url': f"https://www.youtube.com/watch?v={entry.get('id')}"
+    }
+
+
+def _fetch_metadata(entry):
+    """Full extraction for one entry (runs on the shared executor)."""
+    try:
+        full_info = _thread_ydl().extract_info(f"https://www.youtube.com/watch?v={entry['id']}", download=False)
+        remember_info(full_info)
+        artist = full_info.get('artist') or full_info.get('uploader') or ""
+        duration = full_info.get('duration')
+    except Exception:
+        artist = ""
+        duration = None
+    return _make_result(entry, artist, duration)
+
 
 class YouTubeSearcher:
-    def __init__(self):
-        pass
+    def __init__(self, cache=None):
+        # Optional SearchCache; repeat queries then never hit YouTube
+        self.cache = cache
 
-    def search(self, query, max_results=5):
+    def search(self, query, max_results=5, on_result=None, is_cancelled=None):
         """
         Fast YouTube search returning a list of dicts:
         {title, videoId, artist, duration, url}
+
+        Artist/duration come from the flat search when it has them; only the
+        remaining entries get a full extraction on the shared executor.
+        `on_result(index, result)` is called as each result becomes available.
+        If `is_cancelled()` turns true the search stops early and returns [].
         """
-        results = []
+        is_cancelled = is_cancelled or (lambda: False)
+        if self.cache:
+            cached = self.cache.get(query, max_results)
+            if cached is not None:
+                if on_result:
+                    for i, r in enumerate(cached):
+                        on_result(i, r)
+                return cached
 
         # Step 1: Fast flat search (extract only basic info)
         ydl_opts = {
@@ -21,36 +103,40 @@ class YouTubeSearcher:
         }
         with YoutubeDL(ydl_opts) as ydl:
             info = ydl.extract_info(f"ytsearch{max_results}:{query}", download=False)
-            entries = info.get('entries', [])
-
-        # Step 2: Fetch metadata for each entry (lightweight)
-        def fetch_metadata(entry, output_list):
-            with YoutubeDL({'quiet': True}) as ydl:
-                try:
-                    full_info = ydl.extract_info(f"https://www.youtube.com/watch?v={entry['id']}", download=False)
-                    artist = full_info.get('artist') or full_info.get('uploader') or ""
-                    duration = full_info.get('duration')
-                except:
-                    artist = ""
-                    duration = None
-                output_list.append({
-                    'title': entry.get('title'),
-                    'videoId': entry.get('id'),
-                    'artist': artist,
-                    'duration': duration,
-                    'url': f"https://www.youtube.com/watch?v={entry.get('id')}"
-                })
-
-        threads = []
-        for e in entries:
-            t = threading.Thread(target=fetch_metadata, args=(e, results))
-            t.start()
-            threads.append(t)
-
-        # Wait for all threads to finish
-        for t in threads:
-            t.join()
-
-        # Sort results to preserve original order
-        results.sort(key=lambda x: entries.index(next(e for e in entries if e['id'] == x['videoId'])))
+            entries = [e for e in (info.get('entries') or []) if e and e.get('id')]
+        if is_cancelled():
+            return []
+
+        # Step 2: Use flat metadata where possible, fetch the rest
+        results = [None] * len(entries)
+        pending = {}
+        for i, entry in enumerate(entries):
+            artist = entry.get('artist') or entry.get('channel') or entry.get('uploader')
+            duration = entry.get('duration')
+            known = self.cache.get_video(entry['id']) if self.cache else None
+            if known:
+                results[i] = known
+                if on_result:
+                    on_result(i, results[i])
+            elif artist and duration is not None:
+                results[i] = _make_result(entry, artist, duration)
+                if on_result:
+                    on_result(i, results[i])
+            else:
+                pending[_executor.submit(_fetch_metadata, entry)] = i
+
+        for future in as_completed(pending):
+            if is_cancelled():
+                for f in pending:
+                    f.cancel()
+                return []
+            i = pending[future]
+            results[i] = future.result()
+            if on_result:
+                on_result(i, results[i])
+
+        # Results are slotted by index, so original order is preserved
+        results = [r for r in results if r]
+        if self.cache:
+            self.cache.put(query, max_results, results)
         return results
@@ -0,0 +1,33 @@
+import re
+from urllib.parse import urlparse, parse_qs
+
+# Video ids are also used as cache folder names, so nothing else gets through
+_VIDEO_ID_RE = re.compile(r"[A-Za-z0-9_-]{11}")
+
+
+def extract_video_id(url: str):
+    """
+    Return the YouTube video id from a watch / youtu.be / shorts / embed URL,
+    or None if it can't be found or the host isn't YouTube.
+    """
+    if not url:
+        return None
+    try:
+        parsed = urlparse(url.strip())
+    except Exception:
+        return None
+
+    host = (parsed.hostname or "").lower()
+    if host == "youtu.be":
+        video_id = parsed.path.lstrip("/").split("/")[0]
+    elif host == "youtube.com" or host.endswith(".youtube.com"):
+        video_id = parse_qs(parsed.query).get("v", [None])[0]
+        if not video_id:
+            parts = [p for p in parsed.path.split("/") if p]
+            if len(parts) >= 2 and parts[0] in ("shorts", "embed", "live", "v"):
+                video_id = parts[1]
+    else:
+        video_id = None
+    if video_id and _VIDEO_ID_RE.fullmatch(video_id):
+        return video_id
+    return None